@@ -0,0 +1,175 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import Column, Date, Index, Integer, MetaData, Table, delete, event, func, insert, inspect, select
+from sqlalchemy.orm import Session
+from app.database import Base, database_key
+from app.models import Additional, Payment, Reservation, Room, RoomCharge, StatusReservation
+from app.read_model import read_store
+from app.settings import SETTINGS
+
+ARCHIVABLE_STATUSES = [StatusReservation.CHECKOUT, StatusReservation.CANCELED, StatusReservation.NO_SHOW]
+
+# tabelas de arquivo ficam fora do Base.metadata: são criadas sob demanda, uma por ano
+archive_metadata = MetaData()
+
+archive_control = Table(
+    "arquivo_controle", archive_metadata,
+    Column("ano", Integer, primary_key=True),
+    Column("max_check_out", Date, nullable=False)
+)
+
+# tabela quente -> coluna de agrupamento (reserva) usada para mover os filhos junto
+HOT_TABLES = {
+    "reservas": (Reservation.__table__, "id"),
+    "pagamentos": (Payment.__table__, "reservation_id"),
+    "adicionais": (Additional.__table__, "reservation_id"),
+    "diarias": (RoomCharge.__table__, "reservation_id"),
+}
+
+def _archive_table(name: str, year: int) -> Table:
+    table_name = f"{name}_arquivo_{year}"
+    if table_name in archive_metadata.tables:
+        return archive_metadata.tables[table_name]
+
+    source, key = HOT_TABLES[name]
+    columns = [Column(c.name, c.type, primary_key=c.primary_key) for c in source.columns]
+    table = Table(table_name, archive_metadata, *columns)
+    indexed = "check_in" if key == "id" else key
+    Index(f"ix_{table_name}_{indexed}", table.c[indexed])
+    return table
+
+def archive_tables(year: int) -> Dict[str, Table]:
+    return {name: _archive_table(name, year) for name in HOT_TABLES}
+
+_control_ready = set()
+
+def _ensure_control(db: Session):
+    key = database_key(db)
+    if key not in _control_ready:
+        archive_control.create(db.connection(), checkfirst=True)
+        _control_ready.add(key)
+
+def archived_years(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> List[int]:
+    """
+    Anos de arquivo que podem conter reservas tocando [start, end).
+    Reservas vão para o ano do check-in; a marca d'água (maior check-out do ano)
+    descarta anos que terminam antes de `start` sem tocar nas tabelas de arquivo.
+    """
+    _ensure_control(db)
+    query = select(archive_control.c.ano)
+    if start is not None:
+        query = query.where(archive_control.c.max_check_out > start)
+    if end is not None:
+        query = query.where(archive_control.c.ano <= end.year)
+    return [row.ano for row in db.execute(query.order_by(archive_control.c.ano))]
+
+def load_reservations(db: Session, start: date, end: date) -> list:
+    """
+    (id, check_in, check_out, status, basic_fare, room_id) das reservas arquivadas que tocam o período.
+    Só consulta os anos de arquivo necessários; períodos recentes não tocam o arquivo.
+    """
+    rows = []
+    for year in archived_years(db, start, end):
+        archived = archive_tables(year)["reservas"]
+        rows.extend(db.execute(
+            select(archived.c.id, archived.c.check_in, archived.c.check_out, archived.c.status, Room.basic_fare, archived.c.room_id)
+            .join(Room, archived.c.room_id == Room.id)
+            .where(archived.c.check_in < end, archived.c.check_out > start)
+        ).all())
+    return rows
+
+def posted_in_period(db: Session, start: date, end: date) -> Dict[int, tuple]:
+    """Mesmo que utils.posted_in_period, sobre as diárias arquivadas."""
+    posted = {}
+    for year in archived_years(db, start, end):
+        charges = archive_tables(year)["diarias"]
+        posted.update((res_id, (last, total)) for res_id, last, total in db.execute(
+            select(charges.c.reservation_id, func.max(charges.c.date), func.sum(charges.c.value))
+            .where(charges.c.date >= start, charges.c.date < end)
+            .group_by(charges.c.reservation_id)
+        ))
+    return posted
+
+def posted_by_day(db: Session, start: date, end: date) -> Dict[date, float]:
+    """Mesmo que utils.posted_by_day, sobre as diárias arquivadas."""
+    by_day: Dict[date, float] = {}
+    for year in archived_years(db, start, end):
+        charges = archive_tables(year)["diarias"]
+        for day, total in db.execute(
+            select(charges.c.date, func.sum(charges.c.value))
+            .where(charges.c.date >= start, charges.c.date < end)
+            .group_by(charges.c.date)
+        ):
+            by_day[day] = by_day.get(day, 0.0) + total
+    return by_day
+
+def archive_closed_reservations(db: Session, horizon_days: Optional[int] = None, today: Optional[date] = None) -> int:
+    """
+    Move reservas fechadas (CHECKOUT/CANCELADA/NO_SHOW) com check-out anterior ao
+    horizonte, com pagamentos, adicionais e diárias, para as tabelas do ano do check-in.
+    Trabalha em lotes de ARCHIVE_BATCH_SIZE, com commit por lote (pode ser retomado).
+    Os eventos em eventos_reserva ficam: o feed é um log append-only e as tabelas
+    quentes usam AUTOINCREMENT, então o id de uma reserva arquivada nunca volta.
+    """
+    horizon_days = SETTINGS["ARCHIVE_HORIZON_DAYS"] if horizon_days is None else horizon_days
+    cutoff = (today or date.today()) - timedelta(days=horizon_days)
+    _ensure_control(db)
+
+    moved = 0
+    store_key = database_key(db)
+    try:
+        while True:
+            batch = db.query(Reservation.id, Reservation.check_in, Reservation.check_out).filter(
+                Reservation.status.in_(ARCHIVABLE_STATUSES),
+                Reservation.check_out < cutoff
+            ).order_by(Reservation.id).limit(SETTINGS["ARCHIVE_BATCH_SIZE"]).all()
+            if not batch:
+                break
+
+            by_year: Dict[int, list] = {}
+            for res_id, check_in, check_out in batch:
+                by_year.setdefault(check_in.year, []).append((res_id, check_out))
+
+            for year, items in by_year.items():
+                ids = [res_id for res_id, _ in items]
+                tables = archive_tables(year)
+                for name, (source, key) in HOT_TABLES.items():
+                    tables[name].create(db.connection(), checkfirst=True)
+                    columns = [c.name for c in source.columns]
+                    db.execute(insert(tables[name]).from_select(
+                        columns, select(*[source.c[c] for c in columns]).where(source.c[key].in_(ids))
+                    ))
+
+                # marca d'água do ano: até onde vão as reservas arquivadas
+                max_check_out = max(check_out for _, check_out in items)
+                current = db.execute(
+                    select(archive_control.c.max_check_out).where(archive_control.c.ano == year)
+                ).scalar()
+                if current is None:
+                    db.execute(insert(archive_control).values(ano=year, max_check_out=max_check_out))
+                elif max_check_out > current:
+                    db.execute(archive_control.update().where(archive_control.c.ano == year).values(max_check_out=max_check_out))
+
+            ids = [res_id for res_id, _, _ in batch]
+            for name, (source, key) in HOT_TABLES.items():
+                if name != "reservas":
+                    db.execute(delete(source).where(source.c[key].in_(ids)))
+            db.execute(delete(Reservation.__table__).where(Reservation.__table__.c.id.in_(ids)))
+            db.commit()
+            moved += len(batch)
+            # removidas fora do ORM: o modelo de leitura recarrega já a partir deste lote
+            read_store.invalidate(store_key)
+    finally:
+        # lote que falhou no meio também pode ter deixado o modelo de leitura para trás
+        if moved:
+            read_store.invalidate(store_key)
+
+    return moved
+
+# recriar o schema (seed, testes) também descarta o arquivo daquele banco
+@event.listens_for(Base.metadata, "after_drop")
+def _drop_archives(target, connection, **kw):
+    for name in inspect(connection).get_table_names():
+        if name == archive_control.name or "_arquivo_" in name:
+            connection.exec_driver_sql(f'DROP TABLE "{name}"')
+    _control_ready.discard(str(connection.engine.url))
@@ -0,0 +1,14 @@
+import secrets
+from typing import Optional
+from fastapi import Header, HTTPException
+from app.settings import SETTINGS
+
+def valid_admin_token(token: Optional[str]) -> bool:
+    """Sem ADMIN_TOKEN configurado nada é liberado."""
+    expected = SETTINGS["ADMIN_TOKEN"]
+    return bool(expected) and token is not None and secrets.compare_digest(token, expected)
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # dependência das rotas /admin
+    if not valid_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Token de administração inválido.")
@@ -0,0 +1,114 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.coordination import versions
+from app.database import Base, database_key
+from app.models import Room, TypeRoom
+
+@dataclass(frozen=True)
+class RoomInfo:
+    """Dados estáveis de um quarto (o status muda a todo check-in e fica fora do cache)."""
+    id: int
+    number: int
+    type: TypeRoom
+    capacity: int
+    basic_fare: float
+
+class RoomCatalog:
+    """
+    Cache em processo do catálogo de quartos, indexado por id e por número.
+    Cada invalidação incrementa a versão (compartilhada entre workers, ver
+    app/coordination.py); a próxima leitura recarrega o catálogo inteiro.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._loaded_version: Optional[int] = None
+        self._by_id: Dict[int, RoomInfo] = {}
+        self._by_number: Dict[int, RoomInfo] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return versions.current(self.name)
+
+    def invalidate(self):
+        versions.bump(self.name)
+
+    def _ensure_loaded(self, db: Session):
+        version = self.version
+        if self._loaded_version == version:
+            self.hits += 1
+            return
+
+        with self._lock:
+            self.misses += 1
+            rows = db.query(Room.id, Room.number, Room.type, Room.capacity, Room.basic_fare).all()
+            infos = [RoomInfo(*row) for row in rows]
+            self._by_id = {info.id: info for info in infos}
+            self._by_number = {info.number: info for info in infos}
+            self._loaded_version = version
+
+    def get(self, db: Session, room_id: int) -> Optional[RoomInfo]:
+        self._ensure_loaded(db)
+        return self._by_id.get(room_id)
+
+    def get_by_number(self, db: Session, number: int) -> Optional[RoomInfo]:
+        self._ensure_loaded(db)
+        return self._by_number.get(number)
+
+    def all(self, db: Session) -> List[RoomInfo]:
+        self._ensure_loaded(db)
+        return list(self._by_id.values())
+
+    def stats(self) -> dict:
+        return {
+            "versao": self.version,
+            "quartos": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+class RoomCatalogRegistry:
+    """Um RoomCatalog por banco (propriedade), escolhido pelo bind da sessão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalogs: Dict[str, RoomCatalog] = {}
+
+    def for_key(self, key: str) -> RoomCatalog:
+        catalog = self._catalogs.get(key)
+        if catalog is None:
+            with self._lock:
+                catalog = self._catalogs.setdefault(key, RoomCatalog(f"catalogo:{key}"))
+        return catalog
+
+    def for_db(self, db: Session) -> RoomCatalog:
+        return self.for_key(database_key(db))
+
+    def get(self, db: Session, room_id: int) -> Optional[RoomInfo]:
+        return self.for_db(db).get(db, room_id)
+
+    def get_by_number(self, db: Session, number: int) -> Optional[RoomInfo]:
+        return self.for_db(db).get_by_number(db, number)
+
+    def all(self, db: Session) -> List[RoomInfo]:
+        return self.for_db(db).all(db)
+
+    def invalidate(self, db: Session):
+        self.for_db(db).invalidate()
+
+    def stats(self, db: Session) -> dict:
+        return self.for_db(db).stats()
+
+room_catalog = RoomCatalogRegistry()
+
+# tabelas recriadas (seed, testes, nova propriedade) invalidam o catálogo daquele banco
+@event.listens_for(Base.metadata, "after_create")
+@event.listens_for(Base.metadata, "after_drop")
+def _invalidate_on_schema_change(target, connection, **kw):
+    room_catalog.for_key(str(connection.engine.url)).invalidate()
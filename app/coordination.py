@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+from typing import Dict, Optional
+from app.settings import SETTINGS
+
+class VersionCounter:
+    """
+    Contadores de versão nomeados, usados para invalidar caches em processo.
+    Com COORDINATION_DB configurado (modo multi-worker) ficam num arquivo SQLite
+    compartilhado pelos processos; sem ele, num dict local.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: Dict[str, int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        path = SETTINGS["COORDINATION_DB"]
+        if not path:
+            return None
+        if self._conn is None:
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS versoes (nome TEXT PRIMARY KEY, versao INTEGER NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    def current(self, name: str) -> int:
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return self._local.get(name, 0)
+            row = conn.execute("SELECT versao FROM versoes WHERE nome = ?", (name,)).fetchone()
+            return row[0] if row else 0
+
+    def bump(self, name: str) -> int:
+        """Incrementa e devolve a nova versão (atômico entre processos)."""
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                self._local[name] = self._local.get(name, 0) + 1
+                return self._local[name]
+            return conn.execute(
+                "INSERT INTO versoes (nome, versao) VALUES (?, 1) "
+                "ON CONFLICT(nome) DO UPDATE SET versao = versao + 1 RETURNING versao",
+                (name,)
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+versions = VersionCounter()
@@ -1,6 +1,10 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import threading
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Header, HTTPException
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from app.settings import SETTINGS
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./hotel.db"
 
@@ -12,9 +16,121 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+class PropertyEnginePool:
+    """
+    Engines por propriedade (um arquivo SQLite por hotel), limitados a `max_engines`.
+    O menos usado recentemente é descartado quando o limite é atingido.
+    """
+
+    def __init__(self, max_engines: int):
+        self.max_engines = max_engines
+        self._lock = threading.Lock()
+        self._factories: "OrderedDict[int, sessionmaker]" = OrderedDict()
+
+    def session_factory(self, property_id: int) -> sessionmaker:
+        with self._lock:
+            factory = self._factories.get(property_id)
+            if factory is not None:
+                self._factories.move_to_end(property_id)
+                return factory
+
+            property_engine = create_engine(
+                SETTINGS["PROPERTY_DATABASE_URL"].format(property_id=property_id),
+                connect_args={"check_same_thread": False}
+            )
+            upgrade_schema(property_engine)
+
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=property_engine)
+            self._factories[property_id] = factory
+            while len(self._factories) > self.max_engines:
+                _, evicted = self._factories.popitem(last=False)
+                evicted.kw["bind"].dispose()
+            return factory
+
+    def dispose_all(self):
+        with self._lock:
+            for factory in self._factories.values():
+                factory.kw["bind"].dispose()
+            self._factories.clear()
+
+engine_pool = PropertyEnginePool(SETTINGS["MAX_PROPERTY_ENGINES"])
+
+def get_session_factory(property_id: Optional[int] = None) -> sessionmaker:
+    """Sem propriedade usa o banco padrão (hotel.db); só propriedades configuradas têm banco."""
+    if property_id is None:
+        return SessionLocal
+    if property_id not in SETTINGS["PROPERTY_IDS"]:
+        raise HTTPException(status_code=404, detail="Propriedade não encontrada")
+    return engine_pool.session_factory(property_id)
+
+def database_key(db: Session) -> str:
+    """Identifica o banco de uma sessão (chave para caches por propriedade)."""
+    return str(db.get_bind().url)
+
+def get_db(x_property_id: Optional[int] = Header(None)):
+    db = get_session_factory(x_property_id)()
     try:
         yield db
     finally:
         db.close()
+
+# colunas adicionadas depois da criação original das tabelas: create_all não altera
+# tabelas existentes, então bancos antigos recebem as colunas via ALTER TABLE
+ADDED_COLUMNS = [
+    ("reservas", "created_at", "DATE"),
+]
+
+# tabelas de onde o arquivamento apaga linhas: sem AUTOINCREMENT o SQLite reutiliza
+# o maior id apagado e o id novo colide com o arquivado
+AUTOINCREMENT_TABLES = ["reservas", "pagamentos", "adicionais", "diarias"]
+
+def _rebuild_with_autoincrement(conn, name: str):
+    """Recria a tabela com AUTOINCREMENT (o SQLite não muda isso via ALTER TABLE)."""
+    ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).scalar()
+    if ddl is None or "AUTOINCREMENT" in ddl.upper():
+        return
+
+    old = f"{name}_sem_autoincrement"
+    inspector = inspect(conn)
+    columns = ", ".join(f'"{c["name"]}"' for c in inspector.get_columns(name))
+    for index in inspector.get_indexes(name):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    # legacy: as FKs das outras tabelas continuam apontando para o nome original
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    conn.exec_driver_sql(f'ALTER TABLE "{name}" RENAME TO "{old}"')
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+    Base.metadata.tables[name].create(conn)
+    conn.exec_driver_sql(f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM "{old}"')
+    conn.exec_driver_sql(f'DROP TABLE "{old}"')
+
+    # ids já arquivados também não podem voltar
+    archived = [t for t in inspect(conn).get_table_names() if t.startswith(f"{name}_arquivo_")]
+    max_archived = max((conn.exec_driver_sql(f'SELECT MAX(id) FROM "{t}"').scalar() or 0 for t in archived), default=0)
+    if max_archived:
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ? AND seq < ?", (name, max_archived))
+        conn.exec_driver_sql(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? WHERE NOT EXISTS "
+            "(SELECT 1 FROM sqlite_sequence WHERE name = ?)", (name, max_archived, name)
+        )
+
+def upgrade_schema(bind):
+    """
+    Cria as tabelas que ainda não existem, adiciona as colunas novas às antigas e
+    recria com AUTOINCREMENT as tabelas de AUTOINCREMENT_TABLES criadas sem ele.
+    """
+    from app import models  # registra as tabelas no metadata
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table, column, ddl in ADDED_COLUMNS:
+            if column not in {c["name"] for c in inspector.get_columns(table)}:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+        for table in AUTOINCREMENT_TABLES:
+            _rebuild_with_autoincrement(conn, table)
+
+def init_db():
+    """Passo explícito de migração/startup do banco padrão."""
+    upgrade_schema(engine)
+
+if __name__ == "__main__":
+    init_db()
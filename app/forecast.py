@@ -0,0 +1,149 @@
+import math
+from bisect import bisect_left
+from collections import Counter
+from datetime import date
+from typing import Dict, Tuple, Optional
+from sqlalchemy import Table, case, func, select
+from sqlalchemy.orm import Session
+from app import archive
+from app.cache import RoomInfo, room_catalog
+from app.models import Reservation, Room, StatusReservation, TypeRoom
+from app.settings import SETTINGS
+
+# reservas cujo desfecho já é conhecido (entram no histórico)
+CLOSED_STATUSES = [
+    StatusReservation.CHECKIN, StatusReservation.CHECKOUT,
+    StatusReservation.CANCELED, StatusReservation.NO_SHOW
+]
+
+def lead_time_bucket(days: int) -> int:
+    return bisect_left(SETTINGS["FORECAST_LEAD_TIME_BUCKETS"], days)
+
+def bucket_labels() -> list:
+    limits = SETTINGS["FORECAST_LEAD_TIME_BUCKETS"]
+    labels, start = [], 0
+    for limit in limits:
+        labels.append(f"{start}-{limit}")
+        start = limit + 1
+    labels.append(f"{start}+")
+    return labels
+
+def _history_counts(db: Session, table: Table, today: date) -> list:
+    """(tipo, faixa, total, cancelamentos, no-shows) de uma tabela de reservas, em um GROUP BY."""
+    lead = func.julianday(table.c.check_in) - func.julianday(table.c.created_at)
+    limits = SETTINGS["FORECAST_LEAD_TIME_BUCKETS"]
+    bucket = case(*[(lead <= limit, i) for i, limit in enumerate(limits)], else_=len(limits))
+
+    return db.execute(
+        select(
+            Room.type,
+            bucket,
+            func.count(table.c.id),
+            func.sum(case((table.c.status == StatusReservation.CANCELED, 1), else_=0)),
+            func.sum(case((table.c.status == StatusReservation.NO_SHOW, 1), else_=0))
+        ).join(Room, table.c.room_id == Room.id).where(
+            table.c.check_in < today,
+            table.c.created_at.isnot(None),     # reservas anteriores à coluna: antecedência desconhecida
+            table.c.status.in_(CLOSED_STATUSES)
+        ).group_by(Room.type, bucket)
+    ).all()
+
+def historical_rates(db: Session, today: date) -> Dict[Tuple[TypeRoom, int], Tuple[float, float]]:
+    """
+    Probabilidades (cancelamento, no-show) por tipo de quarto e faixa de antecedência.
+    A agregação roda em GROUP BY no banco (uma consulta por tabela, somando as de arquivo);
+    faixas com poucas amostras herdam a taxa geral do tipo.
+    """
+    counts: Dict[Tuple[TypeRoom, int], list] = {}
+    tables = [Reservation.__table__] + [archive.archive_tables(year)["reservas"] for year in archive.archived_years(db)]
+    for table in tables:
+        for room_type, b, n, c, ns in _history_counts(db, table, today):
+            acc = counts.setdefault((room_type, b), [0, 0, 0])
+            acc[0] += n
+            acc[1] += c
+            acc[2] += ns
+
+    limits = SETTINGS["FORECAST_LEAD_TIME_BUCKETS"]
+    rates = {}
+    for room_type in TypeRoom:
+        n_type = sum(v[0] for k, v in counts.items() if k[0] == room_type)
+        c_type = sum(v[1] for k, v in counts.items() if k[0] == room_type)
+        ns_type = sum(v[2] for k, v in counts.items() if k[0] == room_type)
+        type_rate = (c_type / n_type, ns_type / n_type) if n_type else (0.0, 0.0)
+
+        for b in range(len(limits) + 1):
+            n, c, ns = counts.get((room_type, b), (0, 0, 0))
+            rates[(room_type, b)] = (c / n, ns / n) if n >= SETTINGS["FORECAST_MIN_SAMPLES"] else type_rate
+    return rates
+
+def show_probability(rates: dict, room_type: TypeRoom, status: StatusReservation, check_in: date, today: date) -> float:
+    if status == StatusReservation.CHECKIN:
+        return 1.0
+    p_cancel, p_no_show = rates[(room_type, lead_time_bucket((check_in - today).days))]
+    return max(0.0, 1.0 - p_cancel - p_no_show)
+
+def project_occupancy(db: Session, start: date, end: date, today: Optional[date] = None, rates: Optional[dict] = None) -> dict:
+    """
+    Ocupação projetada por tipo de quarto para cada noite em [start, end).
+    Retorna {tipo: {"quartos": n, "reservados": [...], "esperados": [...]}}.
+    """
+    today = today or date.today()
+    rates = rates if rates is not None else historical_rates(db, today)
+    rooms: Dict[int, RoomInfo] = {r.id: r for r in room_catalog.all(db)}
+    rooms_by_type = Counter(r.type for r in rooms.values())
+    total_days = (end - start).days
+
+    projection = {
+        room_type: {"quartos": rooms_by_type[room_type], "reservados": [0] * total_days, "esperados": [0.0] * total_days}
+        for room_type in TypeRoom
+    }
+
+    active = db.query(Reservation.room_id, Reservation.check_in, Reservation.check_out, Reservation.status).filter(
+        Reservation.status.in_([StatusReservation.CONFIRMED, StatusReservation.CHECKIN]),
+        Reservation.check_in < end,
+        Reservation.check_out > start
+    ).all()
+
+    for room_id, check_in, check_out, status in active:
+        room_type = rooms[room_id].type
+        p_show = show_probability(rates, room_type, status, check_in, today)
+        slot = projection[room_type]
+        for i in range((max(check_in, start) - start).days, (min(check_out, end) - start).days):
+            slot["reservados"][i] += 1
+            slot["esperados"][i] += p_show
+
+    return projection
+
+def has_free_room(db: Session, room_type: TypeRoom, check_in: date, check_out: date) -> bool:
+    """Há quarto do tipo sem reserva ativa em todo o período?"""
+    busy = db.query(Reservation.room_id).filter(
+        Reservation.status.in_([StatusReservation.CONFIRMED, StatusReservation.CHECKIN]),
+        Reservation.check_in < check_out,
+        Reservation.check_out > check_in
+    )
+    return db.query(Room.id).filter(Room.type == room_type, Room.id.notin_(busy)).first() is not None
+
+def overbooking_allowed(db: Session, room: RoomInfo, check_in: date, check_out: date, today: Optional[date] = None) -> bool:
+    """
+    Aceita uma reserva além da disponibilidade física se nenhum quarto do tipo estiver
+    livre no período e, em todas as noites, o tipo de quarto ficar dentro do limite
+    configurado e a ocupação esperada não passar do total.
+    """
+    limit = SETTINGS["OVERBOOKING_LIMIT_PERCENT"].get(room.type.value, 0.0)
+    if limit <= 0:
+        return False
+
+    # com quarto do tipo livre a reserva vai para ele, não se empilha no quarto pedido
+    if has_free_room(db, room.type, check_in, check_out):
+        return False
+
+    today = today or date.today()
+    rates = historical_rates(db, today)
+    slot = project_occupancy(db, check_in, check_out, today, rates)[room.type]
+    max_booked = slot["quartos"] + math.floor(slot["quartos"] * limit)
+    p_show = show_probability(rates, room.type, StatusReservation.CONFIRMED, check_in, today)
+
+    for booked, expected in zip(slot["reservados"], slot["esperados"]):
+        if booked + 1 > max_booked or expected + p_show > slot["quartos"]:
+            return False
+    return True
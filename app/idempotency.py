@@ -0,0 +1,157 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Optional
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from app.profiler import ProfiledRoute
+from app.settings import SETTINGS
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+class IdempotencyStore:
+    """
+    Respostas já enviadas, por chave de idempotência, num SQLite próprio (compartilhado
+    entre workers). Uma linha sem status_code indica requisição ainda em andamento;
+    passado IDEMPOTENCY_LEASE desde a reserva ela é tratada como abandonada (worker
+    morto no meio da requisição) e a chave pode ser reservada de novo.
+    Linhas mais antigas que IDEMPOTENCY_TTL são descartadas periodicamente.
+    """
+
+    EVICT_EVERY = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(SETTINGS["IDEMPOTENCY_DB"], check_same_thread=False, isolation_level=None)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chaves_idempotencia ("
+                "chave TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status_code INTEGER, "
+                "body BLOB, media_type TEXT, criado_em REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_chaves_criado_em ON chaves_idempotencia (criado_em)")
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[tuple]:
+        limite = time.time() - SETTINGS["IDEMPOTENCY_TTL"]
+        with self._lock:
+            return self._connection().execute(
+                "SELECT fingerprint, status_code, body, media_type FROM chaves_idempotencia "
+                "WHERE chave = ? AND criado_em >= ?", (key, limite)
+            ).fetchone()
+
+    def reserve(self, key: str, fingerprint: str) -> bool:
+        """Marca a chave como em andamento. False se outra requisição já a reservou."""
+        agora = time.time()
+        with self._lock:
+            conn = self._connection()
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 1:
+                conn.execute("DELETE FROM chaves_idempotencia WHERE criado_em < ?", (agora - SETTINGS["IDEMPOTENCY_TTL"],))
+            # chave expirada ainda nao removida, ou reserva abandonada, pode ser reaproveitada
+            conn.execute(
+                "DELETE FROM chaves_idempotencia WHERE chave = ? AND "
+                "(criado_em < ? OR (status_code IS NULL AND criado_em < ?))",
+                (key, agora - SETTINGS["IDEMPOTENCY_TTL"], agora - SETTINGS["IDEMPOTENCY_LEASE"])
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO chaves_idempotencia (chave, fingerprint, criado_em) VALUES (?, ?, ?)",
+                (key, fingerprint, agora)
+            )
+            return cursor.rowcount == 1
+
+    def save(self, key: str, status_code: int, body: bytes, media_type: Optional[str]):
+        with self._lock:
+            self._connection().execute(
+                "UPDATE chaves_idempotencia SET status_code = ?, body = ?, media_type = ? WHERE chave = ?",
+                (status_code, body, media_type, key)
+            )
+
+    def release(self, key: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM chaves_idempotencia WHERE chave = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+store = IdempotencyStore()
+
+class IdempotentRoute(ProfiledRoute):
+    """
+    Rota que respeita o header Idempotency-Key em métodos de escrita: a primeira
+    resposta (< 500) é guardada e as repetições a recebem sem executar o handler.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            idem_key = request.headers.get("Idempotency-Key")
+            if not idem_key or request.method not in WRITE_METHODS:
+                return await handler(request)
+
+            key = "|".join([
+                request.headers.get("X-Property-Id", ""), request.method, request.url.path, idem_key
+            ])
+            # parâmetros também chegam pela query string (ex.: PATCH /quartos/{id}/status?new_status=)
+            fingerprint = hashlib.sha256(
+                request.url.query.encode() + b"\n" + await request.body()
+            ).hexdigest()
+
+            if not store.reserve(key, fingerprint):
+                return _replay(key, fingerprint)
+
+            try:
+                response = await handler(request)
+            except HTTPException as e:
+                if e.status_code < 500:
+                    body = json.dumps({"detail": e.detail}).encode()
+                    store.save(key, e.status_code, body, "application/json")
+                else:
+                    store.release(key)
+                raise
+            except BaseException:
+                # inclui CancelledError (cliente desconectou, shutdown do worker)
+                store.release(key)
+                raise
+
+            if response.status_code < 500:
+                store.save(key, response.status_code, response.body, response.media_type)
+            else:
+                store.release(key)
+            return response
+
+        return route_handler
+
+def _replay(key: str, fingerprint: str) -> Response:
+    stored = store.get(key)
+    if stored is None:
+        # expirou entre o reserve e a leitura; trata como em andamento
+        stored = (fingerprint, None, None, None)
+
+    stored_fingerprint, status_code, body, media_type = stored
+    if stored_fingerprint != fingerprint:
+        return JSONResponse(
+            status_code=422,
+            content={"detail": "Idempotency-Key já usada com outro corpo de requisição."}
+        )
+    if status_code is None:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": "Requisição com esta Idempotency-Key ainda em processamento."},
+            headers={"Retry-After": "1"}
+        )
+    return Response(
+        content=body, status_code=status_code, media_type=media_type,
+        headers={"Idempotent-Replayed": "true"}
+    )
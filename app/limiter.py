@@ -0,0 +1,137 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from app.settings import SETTINGS
+
+class TokenBucket:
+    """Balde de fichas: `rate` fichas/s, acumulando até `burst`."""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Consome uma ficha. Retorna 0 se permitido, senão os segundos até a próxima ficha."""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class LoadLimiter:
+    """
+    Limites por grupo de rota (LOAD_GROUPS): fichas por cliente e vagas simultâneas.
+    Roda no event loop (middleware), então os contadores não precisam de lock.
+    """
+
+    MAX_BUCKETS = 10_000
+
+    def __init__(self):
+        self.buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+        self.in_flight: Dict[str, int] = {}
+        self.total_in_flight = 0
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        for name, group in SETTINGS["LOAD_GROUPS"].items():
+            if method != group["method"]:
+                continue
+            if path == group["path"] or (group.get("prefix") and path.startswith(group["path"])):
+                return name
+        return None
+
+    def check_rate(self, group_name: str, client_id: str) -> float:
+        group = SETTINGS["LOAD_GROUPS"][group_name]
+        key = (group_name, client_id)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(group["rate"], group["burst"])
+            # LRU: o cliente usado há mais tempo sai quando o limite é atingido
+            while len(self.buckets) > self.MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.take()
+
+    def has_slot(self, group_name: Optional[str]) -> bool:
+        group = SETTINGS["LOAD_GROUPS"].get(group_name, {})
+        limit = group.get("max_concurrency")
+        if limit is not None and self.in_flight.get(group_name, 0) >= limit:
+            return False
+        if not group.get("global_slots", True):
+            return True
+
+        # as últimas vagas globais ficam reservadas para grupos prioritários (reservas)
+        capacity = SETTINGS["MAX_CONCURRENT_REQUESTS"]
+        if not group.get("priority"):
+            capacity -= SETTINGS["PRIORITY_RESERVED_SLOTS"]
+        return self.total_in_flight < capacity
+
+    @staticmethod
+    def _uses_global_slot(group_name: Optional[str]) -> bool:
+        return SETTINGS["LOAD_GROUPS"].get(group_name, {}).get("global_slots", True)
+
+    def acquire(self, group_name: Optional[str]):
+        if self._uses_global_slot(group_name):
+            self.total_in_flight += 1
+        if group_name:
+            self.in_flight[group_name] = self.in_flight.get(group_name, 0) + 1
+
+    def release(self, group_name: Optional[str]):
+        if self._uses_global_slot(group_name):
+            self.total_in_flight -= 1
+        if group_name:
+            self.in_flight[group_name] -= 1
+
+limiter = LoadLimiter()
+
+def client_id(request: Request) -> str:
+    """
+    IP do cliente. Atrás de um proxy listado em TRUSTED_PROXIES usa o último endereço
+    do X-Forwarded-For que não é de um proxy confiável (o que o proxy viu).
+    """
+    host = request.client.host if request.client else "desconhecido"
+    trusted = SETTINGS["TRUSTED_PROXIES"]
+    if host in trusted:
+        for forwarded in reversed(request.headers.get("X-Forwarded-For", "").split(",")):
+            forwarded = forwarded.strip()
+            if forwarded and forwarded not in trusted:
+                return forwarded
+    return host
+
+async def limit_load(request: Request, call_next):
+    """Middleware: 429 quando o cliente excede a taxa do grupo, 503 quando não há vaga."""
+    if not SETTINGS["RATE_LIMIT_ENABLED"]:
+        return await call_next(request)
+
+    group_name = limiter.classify(request.method, request.url.path)
+    if group_name:
+        wait = limiter.check_rate(group_name, client_id(request))
+        if wait:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "Limite de requisições excedido."},
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    if not limiter.has_slot(group_name):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Servidor sobrecarregado, tente novamente."},
+            headers={"Retry-After": str(SETTINGS["SHED_RETRY_AFTER"])}
+        )
+
+    limiter.acquire(group_name)
+    try:
+        return await call_next(request)
+    finally:
+        limiter.release(group_name)
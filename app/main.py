@@ -1,19 +1,34 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.database import engine, Base
-from app.routers import quartos, reservas, hospedes, relatorios
+from app.database import init_db
+from app.limiter import limit_load
+from app.profiler import profile_request
+from app.routers import quartos, reservas, hospedes, relatorios, admin
+from app.settings import SETTINGS
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # schema criado na subida do servidor, nao no import do modulo
+    if SETTINGS["CREATE_SCHEMA_ON_STARTUP"]:
+        init_db()
+    yield
 
 app = FastAPI(
     title="Sistema de Reservas de Hotel",
     description="API para gerenciamento de hotel (Projeto POO - UFCA)",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# profiler opcional por requisição (interno) e limites de carga (externo, 429/503)
+app.middleware("http")(profile_request)
+app.middleware("http")(limit_load)
+
 app.include_router(quartos.router, prefix="/quartos", tags=["Quartos"])
 app.include_router(hospedes.router, prefix="/hospedes", tags=["Hóspedes"])
 app.include_router(reservas.router, prefix="/reservas", tags=["Reservas"])
 app.include_router(relatorios.router, prefix="/relatorios", tags=["Relatórios"])
+app.include_router(admin.router, prefix="/admin", tags=["Administração"])
 
 @app.get("/")
 def root():
@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, UniqueConstraint, Enum as SQLEnum
 from sqlalchemy.orm import relationship, validates
 from app.database import Base
 from enum import Enum
-from datetime import date
+from datetime import date, datetime
 
 class TypeRoom(str, Enum):
     SIMPLE = "SIMPLES"
@@ -99,12 +99,14 @@ class Room(Base):
 class Reservation(Base):
     """Entidade Reserva."""
     __tablename__ = "reservas"
+    __table_args__ = {"sqlite_autoincrement": True}     # ids de reservas arquivadas não são reutilizados
 
     id = Column(Integer, primary_key=True, index=True)
     check_in = Column(Date)
     check_out = Column(Date)
     n_guests = Column(Integer)
     status = Column(SQLEnum(StatusReservation), default=StatusReservation.PENDING)
+    created_at = Column(Date, default=date.today)
     
     guest_id = Column(Integer, ForeignKey("hospedes.id"))
     room_id = Column(Integer, ForeignKey("quartos.id"))
@@ -113,6 +115,7 @@ class Reservation(Base):
     room = relationship("Room", back_populates="reservations")
     payments = relationship("Payment", back_populates="reservation")
     additionals = relationship("Additional", back_populates="reservation")
+    charges = relationship("RoomCharge", back_populates="reservation")
 
     @validates('n_guests')
     def validate_guests(self, key, value):
@@ -139,6 +142,7 @@ class Reservation(Base):
 class Payment(Base):
     """Lançamento de Pagamentos."""
     __tablename__ = "pagamentos"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     method = Column(String)
@@ -151,10 +155,33 @@ class Payment(Base):
 class Additional(Base):
     """Lançamento de Adicionais."""
     __tablename__ = "adicionais"
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     description = Column(String)
     value = Column(Float)
     reservation_id = Column(Integer, ForeignKey("reservas.id"))
 
-    reservation = relationship("Reservation", back_populates="additionals")
\ No newline at end of file
+    reservation = relationship("Reservation", back_populates="additionals")
+
+class RoomCharge(Base):
+    """Diária lançada pela auditoria noturna (uma por quarto-noite)."""
+    __tablename__ = "diarias"
+    __table_args__ = (UniqueConstraint("reservation_id", "date"), {"sqlite_autoincrement": True})
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, index=True)
+    value = Column(Float)
+    reservation_id = Column(Integer, ForeignKey("reservas.id"), index=True)
+    room_id = Column(Integer, ForeignKey("quartos.id"))
+
+    reservation = relationship("Reservation", back_populates="charges")
+
+class ReservationEvent(Base):
+    """Log append-only das mudanças de status das reservas (o id serve de cursor do feed)."""
+    __tablename__ = "eventos_reserva"
+
+    id = Column(Integer, primary_key=True)
+    reservation_id = Column(Integer, ForeignKey("reservas.id"), index=True)
+    status = Column(SQLEnum(StatusReservation))
+    created_at = Column(DateTime, default=datetime.now)
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import Request
+from fastapi.routing import APIRoute
+from app.auth import valid_admin_token
+from app.settings import SETTINGS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# threads executando agora o handler da requisição perfilada (None fora de perfis)
+_profiled_threads: ContextVar[Optional[set]] = ContextVar("profiled_threads", default=None)
+
+class SamplingProfiler:
+    """
+    Profiler estatístico: uma thread lê `sys._current_frames()` a cada `interval`
+    segundos e conta as pilhas (raiz -> folha) das threads em `threads`, que são só
+    as que executam o handler da requisição perfilada (ver ProfiledRoute).
+    Não instrumenta nada; o custo existe só enquanto a amostragem está ativa.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.threads: set = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                # só interessam pilhas passando pelo código do app
+                if any(c.co_filename.startswith(APP_DIR) for c in codes):
+                    self.stacks[tuple(_frame_name(c) for c in reversed(codes))] += 1
+
+def _track_thread(endpoint):
+    """Registra a thread que executa o handler enquanto ele roda (se a requisição é perfilada)."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def tracked(*args, **kwargs):
+            threads = _profiled_threads.get()
+            if threads is None:
+                return await endpoint(*args, **kwargs)
+            ident = threading.get_ident()
+            threads.add(ident)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                threads.discard(ident)
+        return tracked
+
+    @functools.wraps(endpoint)
+    def tracked(*args, **kwargs):
+        threads = _profiled_threads.get()
+        if threads is None:
+            return endpoint(*args, **kwargs)
+        ident = threading.get_ident()
+        threads.add(ident)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            threads.discard(ident)
+    return tracked
+
+class ProfiledRoute(APIRoute):
+    """
+    Rota cujo handler informa ao profiler em que thread do threadpool está rodando,
+    para o perfil não misturar outras requisições simultâneas.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _track_thread(endpoint), **kwargs)
+
+class ProfileStore:
+    """Últimos perfis capturados, em memória (PROFILING_MAX_STORED)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._profiles: deque = deque(maxlen=SETTINGS["PROFILING_MAX_STORED"])
+        self.active = 0
+
+    def try_begin(self) -> bool:
+        with self._lock:
+            if self.active >= SETTINGS["PROFILING_MAX_CONCURRENT"]:
+                return False
+            self.active += 1
+            return True
+
+    def end(self):
+        with self._lock:
+            self.active -= 1
+
+    def add(self, profile: dict) -> int:
+        with self._lock:
+            profile["id"] = next(self._ids)
+            self._profiles.append(profile)
+            return profile["id"]
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != "stacks"} for p in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+profiles = ProfileStore()
+
+def to_collapsed(stacks: Counter) -> str:
+    """Formato collapsed stack (flamegraph.pl / speedscope): `a;b;c contagem` por linha."""
+    return "\n".join(f"{';'.join(stack)} {count}" for stack, count in stacks.most_common())
+
+def to_speedscope(profile: dict) -> dict:
+    frames: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in profile["stacks"].items():
+        samples.append([frames.setdefault(name, len(frames)) for name in stack])
+        weights.append(count * profile["intervalo_ms"])
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": [{"name": name} for name in frames]},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{profile['metodo']} {profile['caminho']}",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }]
+    }
+
+def _should_profile(request: Request) -> bool:
+    # sob demanda só com o token de administração; o sorteio é configuração do servidor
+    if request.headers.get("X-Profile") == "1" and valid_admin_token(request.headers.get("X-Admin-Token")):
+        return True
+    rate = SETTINGS["PROFILING_SAMPLE_RATE"]
+    return rate > 0 and random.random() < rate
+
+async def profile_request(request: Request, call_next):
+    """
+    Middleware: perfila a requisição quando pedido pelo header `X-Profile: 1` (com
+    `X-Admin-Token`) ou sorteada pela PROFILING_SAMPLE_RATE. Desligado (PROFILING_ENABLED False) custa uma consulta ao dict.
+    """
+    if not SETTINGS["PROFILING_ENABLED"] or not _should_profile(request) or not profiles.try_begin():
+        return await call_next(request)
+
+    try:
+        profiler = SamplingProfiler(SETTINGS["PROFILING_INTERVAL"])
+        token = _profiled_threads.set(profiler.threads)
+        inicio = time.perf_counter()
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            stacks = profiler.stop()
+            _profiled_threads.reset(token)
+        profile_id = profiles.add({
+            "metodo": request.method,
+            "caminho": request.url.path,
+            "status_code": response.status_code,
+            "inicio": datetime.now().isoformat(timespec="seconds"),
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 2),
+            "intervalo_ms": SETTINGS["PROFILING_INTERVAL"] * 1000,
+            "amostras": profiler.samples,
+            "stacks": stacks
+        })
+        response.headers["X-Profile-Id"] = str(profile_id)
+        return response
+    finally:
+        profiles.end()
@@ -0,0 +1,225 @@
+import threading
+from array import array
+from datetime import date
+from typing import Dict, Iterator, List, Tuple
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app.coordination import versions
+from app.database import Base, database_key
+from app.models import Reservation, ReservationEvent, Room, StatusReservation
+
+STATUSES = list(StatusReservation)
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+ACTIVE_CODES = {STATUS_CODES[StatusReservation.CONFIRMED], STATUS_CODES[StatusReservation.CHECKIN]}
+
+class ReservationStore:
+    """
+    Modelo de leitura colunar das reservas: arrays paralelos (uma posição por reserva)
+    com datas como ordinais, status como código e a tarifa do quarto.
+    Ocupa uma fração da memória de objetos ORM e não passa pelo identity map.
+    """
+
+    def __init__(self):
+        self.ids = array("q")
+        self.room_ids = array("q")
+        self.check_in = array("l")
+        self.check_out = array("l")
+        self.status = array("b")
+        self.fare = array("d")
+        self.position: Dict[int, int] = {}
+        self.by_room: Dict[int, List[int]] = {}
+        self.room_fares: Dict[int, float] = {}
+        self.version = 0
+        self.reload_version = 0
+        self.event_cursor = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        columns = (self.ids, self.room_ids, self.check_in, self.check_out, self.status, self.fare)
+        return sum(col.itemsize * len(col) for col in columns)
+
+    def upsert(self, res_id: int, room_id: int, check_in: date, check_out: date, status: StatusReservation) -> bool:
+        """Insere ou atualiza uma reserva. False se o quarto é desconhecido (exige recarga)."""
+        fare = self.room_fares.get(room_id)
+        if fare is None:
+            return False
+
+        pos = self.position.get(res_id)
+        if pos is None:
+            # leitores não usam lock: as colunas recebem o valor antes de a posição
+            # ficar visível (ids por último, pois len(ids) limita a varredura de
+            # overlapping; depois position/by_room, usados por has_overlap)
+            pos = len(self.ids)
+            self.room_ids.append(room_id)
+            self.check_in.append(check_in.toordinal())
+            self.check_out.append(check_out.toordinal())
+            self.status.append(STATUS_CODES[status])
+            self.fare.append(fare)
+            self.ids.append(res_id)
+            self.position[res_id] = pos
+            self.by_room.setdefault(room_id, []).append(pos)
+            return True
+
+        if self.room_ids[pos] != room_id:
+            return False
+        self.check_in[pos] = check_in.toordinal()
+        self.check_out[pos] = check_out.toordinal()
+        self.status[pos] = STATUS_CODES[status]
+        return True
+
+    def has_overlap(self, room_id: int, check_in: date, check_out: date) -> bool:
+        """Há reserva ativa (CONFIRMADA/CHECKIN) do quarto no intervalo?"""
+        start, end = check_in.toordinal(), check_out.toordinal()
+        for pos in self.by_room.get(room_id, ()):
+            if self.status[pos] in ACTIVE_CODES and self.check_in[pos] < end and self.check_out[pos] > start:
+                return True
+        return False
+
+    def overlapping(self, start: date, end: date) -> Iterator[Tuple[int, date, date, StatusReservation, float, int]]:
+        """(id, check_in, check_out, status, tarifa, room_id) das reservas que tocam [start, end)."""
+        start_ord, end_ord = start.toordinal(), end.toordinal()
+        check_in, check_out = self.check_in, self.check_out
+        for pos in range(len(self.ids)):
+            if check_in[pos] < end_ord and check_out[pos] > start_ord:
+                yield (
+                    self.ids[pos], date.fromordinal(check_in[pos]), date.fromordinal(check_out[pos]),
+                    STATUSES[self.status[pos]], self.fare[pos], self.room_ids[pos]
+                )
+
+class ReadModelRegistry:
+    """
+    Um ReservationStore por banco, carregado na primeira leitura e mantido em dia
+    pelos commits de sessões ORM. Escritas fora do ORM devem chamar `invalidate`.
+    Duas versões compartilhadas (app/coordination.py) avisam os outros workers:
+    - `reservas:` sobe a cada commit; quem está atrás alcança lendo só as reservas
+      com eventos (eventos_reserva) depois do seu cursor;
+    - `reservas-recarga:` sobe em `invalidate` (remoções, schema) e força recarga.
+    """
+
+    # acima disso é mais barato recarregar do que alcançar pelos eventos
+    MAX_CATCH_UP_EVENTS = 5000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stores: Dict[str, ReservationStore] = {}
+
+    @staticmethod
+    def _version_name(key: str) -> str:
+        return f"reservas:{key}"
+
+    @staticmethod
+    def _reload_name(key: str) -> str:
+        return f"reservas-recarga:{key}"
+
+    def get(self, db: Session) -> ReservationStore:
+        key = database_key(db)
+        reload_version = versions.current(self._reload_name(key))
+        version = versions.current(self._version_name(key))
+        store = self._stores.get(key)
+        if store is None or store.reload_version != reload_version or store.version != version:
+            with self._lock:
+                store = self._stores.get(key)
+                if store is not None and store.reload_version == reload_version and store.version != version:
+                    if self._catch_up(db, store):
+                        store.version = version
+                    else:
+                        store = None
+                if store is None or store.reload_version != reload_version:
+                    store = self._stores[key] = self._load(db)
+                    store.reload_version = reload_version
+                    store.version = version
+        return store
+
+    def _load(self, db: Session) -> ReservationStore:
+        store = ReservationStore()
+        # cursor lido antes das reservas: eventos concorrentes são reaplicados (upsert idempotente)
+        store.event_cursor = db.query(func.coalesce(func.max(ReservationEvent.id), 0)).scalar()
+        store.room_fares = dict(db.query(Room.id, Room.basic_fare).all())
+        rows = db.query(
+            Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out, Reservation.status
+        ).order_by(Reservation.id).all()
+        for row in rows:
+            if None not in row:
+                store.upsert(*row)
+        return store
+
+    def _catch_up(self, db: Session, store: ReservationStore) -> bool:
+        """Aplica as reservas com eventos após o cursor do store. False se é preciso recarregar."""
+        events = db.query(ReservationEvent.id, ReservationEvent.reservation_id).filter(
+            ReservationEvent.id > store.event_cursor
+        ).order_by(ReservationEvent.id).limit(self.MAX_CATCH_UP_EVENTS + 1).all()
+        if len(events) > self.MAX_CATCH_UP_EVENTS:
+            return False
+        if not events:
+            return True
+
+        rows = db.query(
+            Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out, Reservation.status
+        ).filter(Reservation.id.in_({res_id for _, res_id in events})).all()
+        new_rooms = {row.room_id for row in rows if row.room_id not in store.room_fares}
+        if new_rooms:
+            store.room_fares.update(db.query(Room.id, Room.basic_fare).filter(Room.id.in_(new_rooms)).all())
+        for row in rows:
+            if None not in row and not store.upsert(*row):
+                return False
+        store.event_cursor = events[-1].id
+        return True
+
+    def invalidate(self, key: str):
+        with self._lock:
+            versions.bump(self._reload_name(key))
+            self._stores.pop(key, None)
+
+    def apply(self, key: str, changes: List[tuple]):
+        with self._lock:
+            new_version = versions.bump(self._version_name(key))
+            store = self._stores.get(key)
+            if store is None:
+                return
+            for change in changes:
+                if None in change or not store.upsert(*change):
+                    # quarto novo ou dado incompleto: recarrega na próxima leitura
+                    self._stores.pop(key, None)
+                    return
+            # sem commits de outros workers no meio o store fica em dia; senão a
+            # versão fica para trás e a próxima leitura alcança pelos eventos
+            if new_version == store.version + 1:
+                store.version = new_version
+
+read_store = ReadModelRegistry()
+
+# --- sincronização com as escritas ORM ---
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault("read_model_changes", [])
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Reservation):
+            changes.append((obj.id, obj.room_id, obj.check_in, obj.check_out, obj.status))
+    if any(isinstance(obj, Reservation) for obj in session.deleted):
+        session.info["read_model_invalidate"] = True
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    changes = session.info.pop("read_model_changes", None)
+    invalidate = session.info.pop("read_model_invalidate", False)
+    if not changes and not invalidate:
+        return
+    key = str(session.get_bind().url)
+    if invalidate:
+        read_store.invalidate(key)
+    else:
+        read_store.apply(key, changes)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("read_model_changes", None)
+    session.info.pop("read_model_invalidate", None)
+
+# tabelas recriadas (seed, testes) descartam o modelo de leitura daquele banco
+@event.listens_for(Base.metadata, "after_create")
+@event.listens_for(Base.metadata, "after_drop")
+def _invalidate_on_schema_change(target, connection, **kw):
+    read_store.invalidate(str(connection.engine.url))
@@ -0,0 +1,15 @@
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele cai no encoder padrão
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+else:
+    FastJSONResponse = JSONResponse
+
+def rows_to_dicts(rows) -> list:
+    """Converte linhas de consultas por coluna em dicts serializáveis diretamente."""
+    return [row._asdict() for row in rows]
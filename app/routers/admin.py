@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Literal
+from app import profiler
+from app.auth import require_admin
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/perfis")
+def list_profiles():
+    return profiler.profiles.list()
+
+@router.get("/perfis/{profile_id}")
+def get_profile(profile_id: int, formato: Literal["collapsed", "speedscope"] = "collapsed"):
+    profile = profiler.profiles.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado.")
+
+    if formato == "speedscope":
+        return profiler.to_speedscope(profile)
+    return PlainTextResponse(profiler.to_collapsed(profile["stacks"]))
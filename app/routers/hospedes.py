@@ -2,9 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
+from app.idempotency import IdempotentRoute
 from app import models, schemas
+from app.responses import FastJSONResponse, rows_to_dicts
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+
+# colunas projetadas para listagem (evita identity map e validação objeto a objeto)
+GUEST_COLUMNS = (models.Guest.id, models.Guest.name, models.Guest.email, models.Guest.phone)
+DOCUMENT_COLUMNS = (models.Document.type, models.Document.number, models.Document.id)
 
 @router.post("/", response_model=schemas.GuestResponse, status_code=status.HTTP_201_CREATED)
 def create_guest(guest: schemas.GuestCreate, db: Session = Depends(get_db)):
@@ -33,7 +39,17 @@ def create_guest(guest: schemas.GuestCreate, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[schemas.GuestResponse])
 def list_guests(db: Session = Depends(get_db)):
-    return db.query(models.Guest).all()
+    guests = rows_to_dicts(db.query(*GUEST_COLUMNS).order_by(models.Guest.id).all())
+
+    # documentos em uma unica consulta, agrupados por hospede
+    documents = {}
+    for row in db.query(models.Document.guest_id, *DOCUMENT_COLUMNS).order_by(models.Document.id).all():
+        doc = row._asdict()
+        documents.setdefault(doc.pop("guest_id"), []).append(doc)
+
+    for guest in guests:
+        guest["documents"] = documents.get(guest["id"], [])
+    return FastJSONResponse(guests)
 
 @router.get("/{guest_id}", response_model=schemas.GuestResponse)
 def get_guest(guest_id: int, db: Session = Depends(get_db)):
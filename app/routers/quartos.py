@@ -2,26 +2,40 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.database import get_db
+from app.idempotency import IdempotentRoute
 from app import models, schemas
+from app.cache import room_catalog
+from app.responses import FastJSONResponse, rows_to_dicts
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+
+# colunas projetadas para listagem (evita identity map e validação objeto a objeto)
+ROOM_COLUMNS = (
+    models.Room.number, models.Room.type, models.Room.capacity,
+    models.Room.basic_fare, models.Room.id, models.Room.status
+)
 
 @router.post("/", response_model=schemas.RoomResponse, status_code=status.HTTP_201_CREATED)
 def create_room(room: schemas.RoomCreate, db: Session = Depends(get_db)):
 
-    existing_room = db.query(models.Room).filter(models.Room.number == room.number).first()
-    if existing_room:
+    if room_catalog.get_by_number(db, room.number):
         raise HTTPException(status_code=400, detail=f"O quarto {room.number} já existe.")
 
     new_room = models.Room(**room.dict(), status=models.StatusRoom.AVAILABLE)
     db.add(new_room)
     db.commit()
+    room_catalog.invalidate(db)
     db.refresh(new_room)
     return new_room
 
 @router.get("/", response_model=List[schemas.RoomResponse])
 def list_rooms(db: Session = Depends(get_db)):
-    return db.query(models.Room).all()
+    rows = db.query(*ROOM_COLUMNS).order_by(models.Room.id).all()
+    return FastJSONResponse(rows_to_dicts(rows))
+
+@router.get("/catalogo/estatisticas")
+def room_catalog_stats(db: Session = Depends(get_db)):
+    return room_catalog.stats(db)
 
 @router.get("/{room_id}", response_model=schemas.RoomResponse)
 def get_room(room_id: int, db: Session = Depends(get_db)):
@@ -38,4 +52,5 @@ def update_room_status(room_id: int, new_status: models.StatusRoom, db: Session
     
     room.status = new_status
     db.commit()
+    room_catalog.invalidate(db)
     return {"message": f"Status atualizado para {new_status.value}"}
\ No newline at end of file
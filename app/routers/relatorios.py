@@ -1,71 +1,143 @@
-from fastapi import APIRouter, Depends, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models, settings
+from app.database import get_db, get_session_factory
+from app import archive, forecast, models, settings, utils
+from app.cache import room_catalog
+from app.profiler import ProfiledRoute
+from app.read_model import read_store
 from datetime import date, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
-@router.get("/geral")
-def gerar_relatorio_geral(start_date: date, end_date: date, db: Session = Depends(get_db)):
+GROUPINGS = ("type", "room", "day", "week", "month")
+SEGMENT_COLUMNS = [
+    "chave", "receita", "room_nights_vendidas", "room_nights_disponiveis",
+    "taxa_ocupacao_percentual", "adr", "revpar"
+]
+
+def _chave_segmento(group_by: str, dia: date, room) -> Any:
+    if group_by == "type":
+        return room.type.value
+    if group_by == "room":
+        return room.number
+    if group_by == "week":
+        return (dia - timedelta(days=dia.weekday())).isoformat()
+    if group_by == "month":
+        return dia.strftime("%Y-%m")
+    return dia.isoformat()
+
+def calcular_totais(db: Session, start_date: date, end_date: date, group_by: Optional[str] = None) -> Dict[str, Any]:
     """
-    Relatórios entre duas datas:
-    - Taxa de Ocupação (%)
-    - ADR (Diária Média)
-    - RevPAR (Receita por Quarto Disponível)
-    - Contagem de Cancelamentos e No-Shows
+    Somas brutas do período (aditivas, para poder consolidar várias propriedades).
+    Com `group_by`, as mesmas somas saem também por segmento, na mesma passada.
     """
-    
-    if start_date >= end_date:
-        raise HTTPException(status_code=400, detail="Data inicial deve ser anterior à final.")
 
     # obter dados base
-    total_quartos = db.query(models.Room).count()
-    if total_quartos == 0:
-        return {"message": "Nenhum quarto cadastrado para gerar métricas."}
+    quartos = {r.id: r for r in room_catalog.all(db)}
+    total_quartos = len(quartos)
 
-    # reservas que tocam o período solicitado (mesmo que parcialmente)
-    reservas = db.query(models.Reservation).filter(
-        models.Reservation.check_in < end_date,
-        models.Reservation.check_out > start_date
-    ).all()
+    # reservas que tocam o período solicitado (mesmo que parcialmente),
+    # incluindo as arquivadas quando o período alcança o arquivo
+    reservas = list(read_store.get(db).overlapping(start_date, end_date))
+    reservas += archive.load_reservations(db, start_date, end_date)
 
-    receita_hospedagem = 0.0
+    # diárias já lançadas pela auditoria noturna: somas indexadas por reserva;
+    # só as noites ainda não lançadas são calculadas pela tarifa
+    lancadas = utils.posted_in_period(db, start_date, end_date)
+    lancadas.update(archive.posted_in_period(db, start_date, end_date))
+    receita_lancada = sum(total for _, total in lancadas.values())
+
+    receita_hospedagem = receita_lancada
     room_nights_vendidas = 0
-    total_dias_periodo = (end_date - start_date).days
-    total_room_nights_disponiveis = total_quartos * total_dias_periodo
-
-    # calculo dia a dia (para precisão de tarifas de fim de semana/temporada)
-    current_date = start_date
-    while current_date < end_date:
-        
-        for res in reservas:
-            if res.status in [models.StatusReservation.CANCELED, models.StatusReservation.NO_SHOW]:
-                continue
-            
-            if res.check_in <= current_date < res.check_out:
-                diaria = res.room.basic_fare
-                
-                if current_date.weekday() >= 5:
-                    diaria *= settings.SETTINGS["WEEKEND_MULTIPLIER"]
-                
-                if current_date.month in settings.SETTINGS["HIGH_SEASON_MONTHS"]:
-                    diaria *= settings.SETTINGS["SEASON_MULTIPLIER"]
-                
+    segmentos: Dict[Any, list] = {}   # chave -> [receita, vendidas, disponiveis]
+    por_reserva = group_by in ("type", "room")
+
+    for res_id, check_in, check_out, status, basic_fare, room_id in reservas:
+        if status in [models.StatusReservation.CANCELED, models.StatusReservation.NO_SHOW]:
+            continue
+
+        inicio = max(check_in, start_date)
+        fim = min(check_out, end_date)
+        room_nights_vendidas += (fim - inicio).days
+        ultima_lancada, valor_lancado = lancadas.get(res_id, (None, 0.0))
+        if por_reserva:
+            seg = segmentos.setdefault(_chave_segmento(group_by, inicio, quartos[room_id]), [0.0, 0, 0])
+            seg[0] += valor_lancado
+            seg[1] += (fim - inicio).days
+
+        # uma passada pelas noites (tarifa por noite para precisão de fim de semana/temporada)
+        nao_lancada = ultima_lancada + timedelta(days=1) if ultima_lancada else inicio
+        current_date = inicio if group_by and not por_reserva else nao_lancada
+        while current_date < fim:
+            if current_date >= nao_lancada:
+                diaria = utils.calculate_daily_rate(basic_fare, current_date)
                 receita_hospedagem += diaria
-                room_nights_vendidas += 1
-        
-        current_date += timedelta(days=1)
+            else:
+                diaria = 0.0    # receita da noite lançada entra por posted_by_day
+            if por_reserva:
+                seg[0] += diaria
+            elif group_by:
+                seg_dia = segmentos.setdefault(_chave_segmento(group_by, current_date, None), [0.0, 0, 0])
+                seg_dia[0] += diaria
+                seg_dia[1] += 1
+            current_date += timedelta(days=1)
+
+    # segmentos por data: receita lançada somada por noite
+    if group_by and not por_reserva:
+        for por_dia in (utils.posted_by_day(db, start_date, end_date), archive.posted_by_day(db, start_date, end_date)):
+            for dia, total in por_dia.items():
+                segmentos.setdefault(_chave_segmento(group_by, dia, None), [0.0, 0, 0])[0] += total
+
+    # capacidade (room nights disponíveis) de cada segmento
+    if por_reserva:
+        total_dias = (end_date - start_date).days
+        for quarto in quartos.values():
+            segmentos.setdefault(_chave_segmento(group_by, start_date, quarto), [0.0, 0, 0])[2] += total_dias
+    elif group_by:
+        current_date = start_date
+        while current_date < end_date:
+            segmentos.setdefault(_chave_segmento(group_by, current_date, None), [0.0, 0, 0])[2] += total_quartos
+            current_date += timedelta(days=1)
+
+    # contagem de ocorrências (cancelamentos e no-show) das reservas iniciadas no período
+    reservas_inicio_periodo = [r for r in reservas if start_date <= r[1] < end_date]
 
-    # contagem de ocorrências (cancelamentos e no-show)
-    reservas_inicio_periodo = db.query(models.Reservation).filter(
-        models.Reservation.check_in >= start_date,
-        models.Reservation.check_in < end_date
-    ).all()
+    cancelamentos = sum(1 for r in reservas_inicio_periodo if r[3] == models.StatusReservation.CANCELED)
+    no_shows = sum(1 for r in reservas_inicio_periodo if r[3] == models.StatusReservation.NO_SHOW)
 
-    cancelamentos = sum(1 for r in reservas_inicio_periodo if r.status == models.StatusReservation.CANCELED)
-    no_shows = sum(1 for r in reservas_inicio_periodo if r.status == models.StatusReservation.NO_SHOW)
+    totais = {
+        "total_quartos": total_quartos,
+        "receita_hospedagem": receita_hospedagem,
+        "receita_lancada": receita_lancada,
+        "room_nights_vendidas": room_nights_vendidas,
+        "cancelamentos": cancelamentos,
+        "no_shows": no_shows
+    }
+    if group_by:
+        totais["segmentos"] = segmentos
+    return totais
+
+def montar_segmentos(group_by: str, segmentos: Dict[Any, list]) -> Dict[str, Any]:
+    """Segmentos em formato colunar (uma lista por métrica), pronto para gráficos."""
+    colunas = {nome: [] for nome in SEGMENT_COLUMNS}
+    for chave in sorted(segmentos):
+        receita, vendidas, disponiveis = segmentos[chave]
+        colunas["chave"].append(chave)
+        colunas["receita"].append(round(receita, 2))
+        colunas["room_nights_vendidas"].append(vendidas)
+        colunas["room_nights_disponiveis"].append(disponiveis)
+        colunas["taxa_ocupacao_percentual"].append(round(vendidas / disponiveis * 100, 2) if disponiveis else 0.0)
+        colunas["adr"].append(round(receita / vendidas, 2) if vendidas else 0.0)
+        colunas["revpar"].append(round(receita / disponiveis, 2) if disponiveis else 0.0)
+    return {"group_by": group_by, **colunas}
+
+def montar_relatorio(start_date: date, end_date: date, totais: Dict[str, Any]) -> Dict[str, Any]:
+    receita_hospedagem = totais["receita_hospedagem"]
+    room_nights_vendidas = totais["room_nights_vendidas"]
+    total_dias_periodo = (end_date - start_date).days
+    total_room_nights_disponiveis = totais["total_quartos"] * total_dias_periodo
 
     # Métricas Finais
     taxa_ocupacao = (room_nights_vendidas / total_room_nights_disponiveis) * 100 if total_room_nights_disponiveis > 0 else 0.0
@@ -84,6 +156,7 @@ def gerar_relatorio_geral(start_date: date, end_date: date, db: Session = Depend
         },
         "metricas": {
             "receita_total_hospedagem": round(receita_hospedagem, 2),
+            "receita_diarias_lancadas": round(totais["receita_lancada"], 2),
             "room_nights_vendidas": room_nights_vendidas,
             "room_nights_disponiveis": total_room_nights_disponiveis,
             "taxa_ocupacao_percentual": round(taxa_ocupacao, 2),
@@ -91,7 +164,111 @@ def gerar_relatorio_geral(start_date: date, end_date: date, db: Session = Depend
             "revpar": round(revpar, 2)
         },
         "ocorrencias": {
-            "cancelamentos": cancelamentos,
-            "no_shows": no_shows
+            "cancelamentos": totais["cancelamentos"],
+            "no_shows": totais["no_shows"]
         }
     }
+
+@router.get("/geral")
+def gerar_relatorio_geral(
+    start_date: date,
+    end_date: date,
+    group_by: Optional[Literal[GROUPINGS]] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Relatórios entre duas datas:
+    - Taxa de Ocupação (%)
+    - ADR (Diária Média)
+    - RevPAR (Receita por Quarto Disponível)
+    - Contagem de Cancelamentos e No-Shows
+
+    Com `group_by` (type, room, day, week, month) inclui as mesmas métricas por
+    segmento em `segmentos`, no formato colunar.
+    """
+    
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="Data inicial deve ser anterior à final.")
+
+    totais = calcular_totais(db, start_date, end_date, group_by)
+    if totais["total_quartos"] == 0:
+        return {"message": "Nenhum quarto cadastrado para gerar métricas."}
+
+    relatorio = montar_relatorio(start_date, end_date, totais)
+    if group_by:
+        relatorio["segmentos"] = montar_segmentos(group_by, totais["segmentos"])
+    return relatorio
+
+def _totais_da_propriedade(property_id: int, start_date: date, end_date: date) -> Dict[str, Any]:
+    db = get_session_factory(property_id)()
+    try:
+        return calcular_totais(db, start_date, end_date)
+    finally:
+        db.close()
+
+@router.get("/geral/consolidado")
+def gerar_relatorio_consolidado(start_date: date, end_date: date, propriedades: List[int] = Query(...)):
+    """
+    Mesmas métricas de /geral somando várias propriedades.
+    Cada propriedade é consultada em paralelo no seu próprio banco.
+    """
+
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="Data inicial deve ser anterior à final.")
+
+    propriedades = list(dict.fromkeys(propriedades))
+    for pid in propriedades:
+        get_session_factory(pid)    # 404 para propriedade desconhecida antes de abrir as consultas
+    with ThreadPoolExecutor(max_workers=min(len(propriedades), settings.SETTINGS["MAX_PROPERTY_ENGINES"])) as executor:
+        parciais = list(executor.map(lambda pid: _totais_da_propriedade(pid, start_date, end_date), propriedades))
+
+    totais = {chave: sum(p[chave] for p in parciais) for chave in parciais[0]}
+    relatorio = montar_relatorio(start_date, end_date, totais)
+    relatorio["por_propriedade"] = {
+        pid: montar_relatorio(start_date, end_date, parcial)["metricas"]
+        for pid, parcial in zip(propriedades, parciais)
+    }
+    return relatorio
+
+@router.get("/previsao")
+def gerar_previsao(start_date: date, end_date: date, db: Session = Depends(get_db)):
+    """
+    Previsão de ocupação por noite futura, descontando a probabilidade histórica de
+    cancelamento e no-show por tipo de quarto e antecedência da reserva.
+    """
+
+    if start_date >= end_date:
+        raise HTTPException(status_code=400, detail="Data inicial deve ser anterior à final.")
+
+    hoje = date.today()
+    taxas = forecast.historical_rates(db, hoje)
+    projecao = forecast.project_occupancy(db, start_date, end_date, hoje, taxas)
+    total_quartos = sum(p["quartos"] for p in projecao.values())
+
+    previsao = []
+    for i in range((end_date - start_date).days):
+        reservados = sum(p["reservados"][i] for p in projecao.values())
+        esperados = sum(p["esperados"][i] for p in projecao.values())
+        previsao.append({
+            "data": start_date + timedelta(days=i),
+            "reservados": reservados,
+            "esperados": round(esperados, 2),
+            "ocupacao_projetada_percentual": round(esperados / total_quartos * 100, 2) if total_quartos else 0.0,
+            "por_tipo": {
+                tipo.value: {"reservados": p["reservados"][i], "esperados": round(p["esperados"][i], 2)}
+                for tipo, p in projecao.items() if p["quartos"]
+            }
+        })
+
+    faixas = forecast.bucket_labels()
+    return {
+        "periodo": {"inicio": start_date, "fim": end_date},
+        "taxas_historicas": {
+            tipo.value: [
+                {"antecedencia_dias": faixa, "cancelamento": round(taxas[(tipo, b)][0], 4), "no_show": round(taxas[(tipo, b)][1], 4)}
+                for b, faixa in enumerate(faixas)
+            ]
+            for tipo in models.TypeRoom
+        },
+        "previsao": previsao
+    }
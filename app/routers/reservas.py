@@ -1,17 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
 from app.database import get_db
-from app import models, schemas, settings, utils
-from typing import List
-from datetime import date
+from app.idempotency import IdempotentRoute
+from app import archive, forecast, models, schemas, settings, utils
+from app.cache import room_catalog
+from app.responses import FastJSONResponse, rows_to_dicts
+from typing import List, Optional
+from datetime import date, timedelta
+import asyncio
+import time
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+
+EVENT_COLUMNS = (
+    models.ReservationEvent.id, models.ReservationEvent.reservation_id,
+    models.ReservationEvent.status, models.ReservationEvent.created_at
+)
 
 # criar reserva
 @router.post("/", response_model=schemas.ReservationResponse, status_code=status.HTTP_201_CREATED)
 def create_reservation(res: schemas.ReservationCreate, db: Session = Depends(get_db)):
     # busca quarto
-    room = db.query(models.Room).filter(models.Room.id == res.room_id).first()
+    room = room_catalog.get(db, res.room_id)
     if not room:
         raise HTTPException(status_code=404, detail="Quarto não encontrado")
 
@@ -23,9 +35,13 @@ def create_reservation(res: schemas.ReservationCreate, db: Session = Depends(get
     if res.check_in >= res.check_out:
         raise HTTPException(status_code=400, detail="Data de check-in deve ser anterior ao check-out")
 
-    # valida disponibilidade
-    if not utils.is_room_available(db, res.room_id, res.check_in, res.check_out):
-        raise HTTPException(status_code=400, detail="Quarto indisponível para este período.")
+    # valida disponibilidade (ou overbooking controlado, se habilitado para o tipo)
+    if not utils.is_room_available(db, res.room_id, res.check_in, res.check_out) and \
+            not forecast.overbooking_allowed(db, room, res.check_in, res.check_out):
+        detail = "Quarto indisponível para este período."
+        if forecast.has_free_room(db, room.type, res.check_in, res.check_out):
+            detail += " Há outro quarto do mesmo tipo livre."
+        raise HTTPException(status_code=400, detail=detail)
 
     try:
         # cria
@@ -34,20 +50,55 @@ def create_reservation(res: schemas.ReservationCreate, db: Session = Depends(get
             status=models.StatusReservation.CONFIRMED
         )
         db.add(new_res)
+        db.flush()
+        db.add(models.ReservationEvent(reservation_id=new_res.id, status=new_res.status))
         db.commit()
         db.refresh(new_res)
         return new_res
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-# checkin
-@router.post("/{res_id}/checkin")
-def check_in(res_id: int, db: Session = Depends(get_db)):
-    # busca
-    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
-    if not res:
-        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+def _fetch_events(db: Session, since: int, limit: int) -> list:
+    rows = db.query(*EVENT_COLUMNS).filter(
+        models.ReservationEvent.id > since
+    ).order_by(models.ReservationEvent.id).limit(limit).all()
+    # encerra a transação: a conexão volta ao pool enquanto o consumidor espera
+    db.rollback()
+    return rows
+
+# feed de eventos (long-poll)
+@router.get("/eventos")
+async def list_events(since: int = 0, limit: int = 100, wait: float = 0, db: Session = Depends(get_db)):
+    """
+    Eventos com id > `since`, em ordem. Com `wait` > 0 a requisição aguarda até
+    `wait` segundos por novos eventos antes de responder vazia.
+    Use o `cursor` da resposta como `since` da próxima chamada.
+    A espera roda no event loop, sem ocupar thread do threadpool.
+    """
+    limit = max(1, min(limit, 1000))
+    deadline = time.monotonic() + min(max(wait, 0), settings.SETTINGS["EVENT_FEED_MAX_WAIT"])
 
+    while True:
+        rows = await run_in_threadpool(_fetch_events, db, since, limit)
+        if rows or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.SETTINGS["EVENT_FEED_POLL_INTERVAL"])
+
+    eventos = rows_to_dicts(rows)
+    return FastJSONResponse({
+        "eventos": eventos,
+        "cursor": eventos[-1]["id"] if eventos else since
+    })
+
+# --- regras de ciclo de vida (compartilhadas pelos endpoints unitarios e em lote) ---
+# validam antes de alterar qualquer coisa; erros saem como HTTPException
+
+def _set_status(db: Session, res: models.Reservation, novo_status: models.StatusReservation):
+    # toda mudanca de status gera um evento na mesma transacao
+    res.status = novo_status
+    db.add(models.ReservationEvent(reservation_id=res.id, status=novo_status))
+
+def _apply_check_in(db: Session, res: models.Reservation):
     # valida status
     if res.status != models.StatusReservation.CONFIRMED:
         raise HTTPException(status_code=400, detail="Apenas reservas CONFIRMADAS podem fazer check-in")
@@ -56,47 +107,43 @@ def check_in(res_id: int, db: Session = Depends(get_db)):
     if date.today() < res.check_in:
          raise HTTPException(status_code=400, detail="Check-in não permitido antes da data agendada.")
 
+    # valida quarto (com overbooking duas reservas podem apontar para o mesmo quarto)
+    db.flush()
+    ocupante = db.query(models.Reservation.id).filter(
+        models.Reservation.room_id == res.room_id,
+        models.Reservation.status == models.StatusReservation.CHECKIN,
+        models.Reservation.id != res.id
+    ).first()
+    if ocupante:
+        raise HTTPException(status_code=400, detail="Quarto ocupado por outra reserva em CHECKIN. Realoque a reserva antes do check-in.")
+
     # atualiza
-    res.status = models.StatusReservation.CHECKIN
+    _set_status(db, res, models.StatusReservation.CHECKIN)
     res.room.status = models.StatusRoom.OCCUPIED
-    
-    db.commit()
-    return {"message": "Check-in realizado com sucesso", "status": "CHECKIN"}
-
-# registrar pagamento
-@router.post("/{res_id}/pagamentos", status_code=status.HTTP_201_CREATED)
-def registrar_pagamento(res_id: int, pag: schemas.PaymentCreate, db: Session = Depends(get_db)):
-    # busca
-    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
-    if not res:
-        raise HTTPException(status_code=404, detail="Reserva não encontrada")
-
-    # registra
-    novo_pagamento = models.Payment(
-        method=pag.method,
-        value=pag.value,
-        reservation_id=res_id
-    )
-    db.add(novo_pagamento)
-    db.commit()
-    return {"message": "Pagamento registrado", "valor": pag.value}
 
-# checkout
-@router.post("/{res_id}/checkout")
-def check_out(res_id: int, db: Session = Depends(get_db)):
-    # busca
-    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
-    
+def _apply_check_out(db: Session, res: models.Reservation, noites_lancadas: int, valor_lancado: float):
+    """Valida o saldo e marca CHECKOUT. Retorna (financeiro, diarias pendentes a lancar)."""
     # valida status
-    if not res or res.status != models.StatusReservation.CHECKIN:
+    if res.status != models.StatusReservation.CHECKIN:
         raise HTTPException(status_code=400, detail="Reserva deve estar em CHECKIN para realizar checkout")
 
-    # calculo total
-    valor_diarias = utils.calculate_total_price(
-        room_price=res.room.basic_fare,
-        check_in=res.check_in,
-        check_out=res.check_out
+    # calculo total (diarias ja lancadas pela auditoria + noites restantes)
+    pendentes = utils.build_charge_rows(
+        reservation_id=res.id,
+        room_id=res.room_id,
+        room_price=room_catalog.get(db, res.room_id).basic_fare,
+        start=res.check_in + timedelta(days=noites_lancadas),
+        end=res.check_out
     )
+    financeiro = _settle(res, valor_lancado + sum(row["value"] for row in pendentes))
+
+    # atualiza
+    _set_status(db, res, models.StatusReservation.CHECKOUT)
+    return financeiro, pendentes
+
+def _settle(res: models.Reservation, valor_diarias: float) -> dict:
+    """Confere pagamentos contra diarias + adicionais; 400 se ainda ha saldo devedor."""
+    valor_diarias = round(valor_diarias, 2)
     valor_adicionais = sum([add.value for add in res.additionals])
     total_devido = valor_diarias + valor_adicionais
     total_pago = sum([p.value for p in res.payments])
@@ -109,29 +156,13 @@ def check_out(res_id: int, db: Session = Depends(get_db)):
             detail=f"Check-out bloqueado. Pendente: R$ {falta:.2f}. (Pago: {total_pago}, Total: {total_devido})"
         )
 
-    # atualiza
-    res.status = models.StatusReservation.CHECKOUT
-    res.room.status = models.StatusRoom.AVAILABLE
-    
-    db.commit()
-    
     return {
-        "message": "Check-out realizado",
-        "financeiro": {
-            "total_servicos": total_devido,
-            "total_pago": total_pago,
-            "troco": total_pago - total_devido
-        }
+        "total_servicos": total_devido,
+        "total_pago": total_pago,
+        "troco": total_pago - total_devido
     }
 
-# cancelamento
-@router.post("/{res_id}/cancel")
-def cancel_reservation(res_id: int, db: Session = Depends(get_db)):
-    # busca
-    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
-    if not res:
-        raise HTTPException(status_code=404, detail="Reserva não encontrada")
-    
+def _apply_cancel(db: Session, res: models.Reservation) -> str:
     # valida status
     if res.status in [models.StatusReservation.CHECKIN, models.StatusReservation.CHECKOUT]:
          raise HTTPException(status_code=400, detail="Não é possível cancelar reservas em andamento.")
@@ -140,7 +171,8 @@ def cancel_reservation(res_id: int, db: Session = Depends(get_db)):
     
     # aplica multa
     if date.today() >= res.check_in:
-        total_estimado = utils.calculate_total_price(res.room.basic_fare, res.check_in, res.check_out)
+        room = room_catalog.get(db, res.room_id)
+        total_estimado = utils.calculate_total_price(room.basic_fare, res.check_in, res.check_out)
         valor_multa = total_estimado * settings.SETTINGS["CANCELLATION_FEE_PERCENT"]
         
         multa = models.Additional(
@@ -152,9 +184,180 @@ def cancel_reservation(res_id: int, db: Session = Depends(get_db)):
         mensagem = f"Reserva cancelada com MULTA de R$ {valor_multa:.2f} aplicada."
 
     # cancela
-    res.status = models.StatusReservation.CANCELED
+    _set_status(db, res, models.StatusReservation.CANCELED)
     res.room.status = models.StatusRoom.AVAILABLE 
+    return mensagem
+
+def _apply_payment(db: Session, res: models.Reservation, pag: schemas.PaymentCreate):
+    # registra
+    novo_pagamento = models.Payment(
+        method=pag.method,
+        value=pag.value,
+        reservation_id=res.id
+    )
+    db.add(novo_pagamento)
+
+def _release_rooms(db: Session, room_ids: List[int]):
+    # libera quartos com um unico UPDATE
+    if room_ids:
+        db.query(models.Room).filter(models.Room.id.in_(room_ids)).update(
+            {models.Room.status: models.StatusRoom.AVAILABLE}, synchronize_session=False
+        )
+
+# --- operacoes em lote (declaradas antes das rotas /{res_id}/...) ---
+
+def _load_reservations(db: Session, ids: List[int], *options) -> dict:
+    # uma consulta para todas as reservas (+ uma por relacionamento carregado)
+    query = db.query(models.Reservation).filter(models.Reservation.id.in_(set(ids)))
+    if options:
+        query = query.options(*options)
+    return {r.id: r for r in query.all()}
+
+def _run_batch(db: Session, items: List[tuple], reservas: dict, atomic: bool, operation) -> dict:
+    """
+    Aplica `operation(res, payload)` a cada par (id, payload) e devolve o resultado por item.
+    Em modo atomico qualquer falha desfaz o lote inteiro (409); senao so os itens validos sao gravados.
+    """
+    resultados = []
+    for res_id, payload in items:
+        res = reservas.get(res_id)
+        try:
+            if not res:
+                raise HTTPException(status_code=404, detail="Reserva não encontrada")
+            resultado = operation(res, payload) or {}
+            resultados.append({"id": res_id, "ok": True, **resultado})
+        except HTTPException as e:
+            resultados.append({"id": res_id, "ok": False, "status_code": e.status_code, "erro": e.detail})
+
+    falhas = sum(1 for r in resultados if not r["ok"])
+    if atomic and falhas:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={
+            "message": f"Lote desfeito: {falhas} item(ns) com erro.",
+            "resultados": resultados
+        })
+    return {"sucessos": len(resultados) - falhas, "falhas": falhas, "resultados": resultados}
+
+@router.post("/lote/checkin")
+def batch_check_in(lote: schemas.BatchRequest, db: Session = Depends(get_db)):
+    reservas = _load_reservations(db, lote.ids, selectinload(models.Reservation.room))
+    resumo = _run_batch(
+        db, [(i, None) for i in lote.ids], reservas, lote.atomic,
+        lambda res, _: _apply_check_in(db, res)
+    )
+    db.commit()
+    return resumo
+
+@router.post("/lote/checkout")
+def batch_check_out(lote: schemas.BatchRequest, db: Session = Depends(get_db)):
+    reservas = _load_reservations(
+        db, lote.ids,
+        selectinload(models.Reservation.payments),
+        selectinload(models.Reservation.additionals)
+    )
+    lancadas = utils.posted_charges_many(db, list(reservas))
+    pendentes, liberados = [], []
+
+    def operation(res, _):
+        financeiro, rows = _apply_check_out(db, res, *lancadas.get(res.id, (0, 0.0)))
+        pendentes.extend(rows)
+        liberados.append(res.room_id)
+        return {"financeiro": financeiro}
+
+    resumo = _run_batch(db, [(i, None) for i in lote.ids], reservas, lote.atomic, operation)
+    utils.insert_charges(db, pendentes)
+
+    # confere com o que ficou de fato lancado (a auditoria pode ter lancado noites no meio)
+    ok = [r["id"] for r in resumo["resultados"] if r["ok"]]
+    lancadas = utils.posted_charges_many(db, ok)
+    try:
+        for r in resumo["resultados"]:
+            if r["ok"]:
+                r["financeiro"] = _settle(reservas[r["id"]], lancadas.get(r["id"], (0, 0.0))[1])
+    except HTTPException:
+        db.rollback()
+        raise
+    _release_rooms(db, liberados)
+    db.commit()
+    return resumo
+
+@router.post("/lote/cancel")
+def batch_cancel(lote: schemas.BatchRequest, db: Session = Depends(get_db)):
+    reservas = _load_reservations(db, lote.ids, selectinload(models.Reservation.room))
+    resumo = _run_batch(
+        db, [(i, None) for i in lote.ids], reservas, lote.atomic,
+        lambda res, _: {"message": _apply_cancel(db, res)}
+    )
+    db.commit()
+    return resumo
+
+@router.post("/lote/pagamentos", status_code=status.HTTP_201_CREATED)
+def batch_payments(lote: schemas.BatchPaymentRequest, db: Session = Depends(get_db)):
+    reservas = _load_reservations(db, [p.reservation_id for p in lote.payments])
+
+    def operation(res, pag):
+        _apply_payment(db, res, pag)
+        return {"valor": pag.value}
+
+    resumo = _run_batch(
+        db, [(p.reservation_id, p) for p in lote.payments], reservas, lote.atomic, operation
+    )
+    db.commit()
+    return resumo
+
+# checkin
+@router.post("/{res_id}/checkin")
+def check_in(res_id: int, db: Session = Depends(get_db)):
+    # busca
+    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
+    if not res:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+
+    _apply_check_in(db, res)
+    db.commit()
+    return {"message": "Check-in realizado com sucesso", "status": "CHECKIN"}
+
+# registrar pagamento
+@router.post("/{res_id}/pagamentos", status_code=status.HTTP_201_CREATED)
+def registrar_pagamento(res_id: int, pag: schemas.PaymentCreate, db: Session = Depends(get_db)):
+    # busca
+    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
+    if not res:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+
+    _apply_payment(db, res, pag)
+    db.commit()
+    return {"message": "Pagamento registrado", "valor": pag.value}
+
+# checkout
+@router.post("/{res_id}/checkout")
+def check_out(res_id: int, db: Session = Depends(get_db)):
+    # busca
+    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
+    if not res:
+        raise HTTPException(status_code=400, detail="Reserva deve estar em CHECKIN para realizar checkout")
+
+    _, pendentes = _apply_check_out(db, res, *utils.posted_charges(db, res.id))
+    utils.insert_charges(db, pendentes)
+    # confere com o que ficou de fato lancado (a auditoria pode ter lancado noites no meio)
+    financeiro = _settle(res, utils.posted_charges(db, res.id)[1])
+    _release_rooms(db, [res.room_id])
+    db.commit()
     
+    return {
+        "message": "Check-out realizado",
+        "financeiro": financeiro
+    }
+
+# cancelamento
+@router.post("/{res_id}/cancel")
+def cancel_reservation(res_id: int, db: Session = Depends(get_db)):
+    # busca
+    res = db.query(models.Reservation).filter(models.Reservation.id == res_id).first()
+    if not res:
+        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+
+    mensagem = _apply_cancel(db, res)
     db.commit()
     return {"message": mensagem}
 
@@ -170,13 +373,52 @@ def process_no_shows(db: Session = Depends(get_db)):
     # atualiza em lote
     count = 0
     for r in reservas_atrasadas:
-        r.status = models.StatusReservation.NO_SHOW
+        _set_status(db, r, models.StatusReservation.NO_SHOW)
         r.room.status = models.StatusRoom.AVAILABLE
         count += 1
     
     db.commit()
     return {"message": f"{count} reservas marcadas como NO_SHOW."}
 
+# rotina de arquivamento
+@router.post("/rotinas/arquivar")
+def archive_reservations(horizonte_dias: Optional[int] = None, db: Session = Depends(get_db)):
+    # move reservas fechadas antigas para as tabelas de arquivo (por ano)
+    count = archive.archive_closed_reservations(db, horizonte_dias)
+    return {"message": f"{count} reservas arquivadas."}
+
+# rotina auditoria noturna
+@router.post("/rotinas/auditoria-noturna")
+def night_audit(data: Optional[date] = None, db: Session = Depends(get_db)):
+    # lanca diarias ate a noite informada (padrao: hoje)
+    data = data or date.today()
+    count = utils.post_night_audit(db, data)
+    db.commit()
+    return {"message": f"{count} diárias lançadas.", "data": data}
+
+# extrato (folio)
+@router.get("/{res_id}/folio")
+def get_folio(res_id: int, db: Session = Depends(get_db)):
+    # busca
+    if not db.query(models.Reservation).filter(models.Reservation.id == res_id).first():
+        raise HTTPException(status_code=404, detail="Reserva não encontrada")
+
+    noites_lancadas, valor_diarias = utils.posted_charges(db, res_id)
+    valor_adicionais = db.query(func.coalesce(func.sum(models.Additional.value), 0.0)).filter(
+        models.Additional.reservation_id == res_id
+    ).scalar()
+    total_pago = db.query(func.coalesce(func.sum(models.Payment.value), 0.0)).filter(
+        models.Payment.reservation_id == res_id
+    ).scalar()
+
+    return {
+        "noites_lancadas": noites_lancadas,
+        "total_diarias": round(valor_diarias, 2),
+        "total_adicionais": round(valor_adicionais, 2),
+        "total_pago": round(total_pago, 2),
+        "saldo": round(valor_diarias + valor_adicionais - total_pago, 2)
+    }
+
 # listar adicionais
 @router.get("/{res_id}/additionals", response_model=List[schemas.AdditionalResponse])
 def get_additionals(res_id: int, db: Session = Depends(get_db)):
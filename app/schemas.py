@@ -70,4 +70,16 @@ class ReservationResponse(BaseModel):
     guest_id: int
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Operações em lote ---
+class BatchRequest(BaseModel):
+    ids: List[int]
+    atomic: bool = False    # True: qualquer falha desfaz o lote inteiro
+
+class BatchPaymentItem(PaymentCreate):
+    reservation_id: int
+
+class BatchPaymentRequest(BaseModel):
+    payments: List[BatchPaymentItem]
+    atomic: bool = False
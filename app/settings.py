@@ -1,3 +1,5 @@
+import os
+
 SETTINGS = {
     "CHECKIN_START": 14,                # Horas (14:00)
     "CHECKOUT_LIMIT": 12,               # Horas (12:00)
@@ -5,5 +7,44 @@ SETTINGS = {
     "SEASON_MULTIPLIER": 1.5,           # +50% na alta temporada
     "HIGH_SEASON_MONTHS": [12, 1, 7],   # Dez, Jan, Jul
     "TOLERANCE_NO_SHOW": 24,            # Horas após check-in para considerar No-Show
-    "CANCELLATION_FEE_PERCENT": 0.30    # 30% do total da reserva se cancelar em cima da hora
+    "CANCELLATION_FEE_PERCENT": 0.30,   # 30% do total da reserva se cancelar em cima da hora
+    "CREATE_SCHEMA_ON_STARTUP": os.environ.get("HOTEL_CREATE_SCHEMA_ON_STARTUP", "1") == "1",  # False quando o schema é criado via `python -m app.database`
+    "COORDINATION_DB": os.environ.get("HOTEL_COORDINATION_DB"),  # SQLite de versões compartilhado entre workers (None = processo único)
+    "PROPERTY_DATABASE_URL": "sqlite:///./hotel_{property_id}.db",  # Banco de cada propriedade (header X-Property-Id)
+    "PROPERTY_IDS": [],                 # Propriedades atendidas; X-Property-Id fora da lista recebe 404
+    "MAX_PROPERTY_ENGINES": 16,         # Engines de propriedades mantidos abertos ao mesmo tempo
+    "FORECAST_LEAD_TIME_BUCKETS": [7, 30, 90],  # Faixas de antecedência (dias): 0-7, 8-30, 31-90, 91+
+    "FORECAST_MIN_SAMPLES": 20,         # Abaixo disso a faixa usa a taxa geral do tipo de quarto
+    "IDEMPOTENCY_DB": "./idempotencia.db",  # Respostas guardadas por Idempotency-Key
+    "IDEMPOTENCY_TTL": 24 * 60 * 60,    # Segundos que uma chave de idempotência vale
+    "IDEMPOTENCY_LEASE": 60,            # Segundos até uma chave em andamento ser considerada abandonada
+    "RATE_LIMIT_ENABLED": True,         # Limites de taxa e de concorrência (app/limiter.py)
+    "TRUSTED_PROXIES": [],              # Proxies cujo X-Forwarded-For identifica o cliente no rate limit
+    "MAX_CONCURRENT_REQUESTS": 40,      # Vagas simultâneas no total (= threadpool padrão)
+    "PRIORITY_RESERVED_SLOTS": 8,       # Vagas finais reservadas a grupos prioritários
+    "SHED_RETRY_AFTER": 1,              # Retry-After (s) das respostas 503
+    "LOAD_GROUPS": {                    # Taxa por cliente (req/s, rajada) e vagas por grupo de rota
+        "reservas": {"method": "POST", "path": "/reservas/", "rate": 20, "burst": 60,
+                     "max_concurrency": None, "priority": True},
+        "relatorios": {"method": "GET", "path": "/relatorios/", "prefix": True, "rate": 2, "burst": 10,
+                       "max_concurrency": 2, "priority": False},
+        # long-poll espera no event loop: não ocupa vaga global (global_slots False)
+        "eventos": {"method": "GET", "path": "/reservas/eventos", "rate": 10, "burst": 30,
+                    "max_concurrency": None, "priority": False, "global_slots": False}
+    },
+    "ARCHIVE_HORIZON_DAYS": 365,        # Reservas fechadas há mais tempo que isso vão para o arquivo
+    "ARCHIVE_BATCH_SIZE": 500,          # Reservas movidas por transação no arquivamento
+    "ADMIN_TOKEN": os.environ.get("HOTEL_ADMIN_TOKEN"),  # Header X-Admin-Token de /admin e X-Profile (None = desativado)
+    "PROFILING_ENABLED": False,         # Liga o profiler por requisição (header X-Profile: 1)
+    "PROFILING_SAMPLE_RATE": 0.0,       # Fração de requisições perfiladas sem o header
+    "PROFILING_INTERVAL": 0.005,        # Segundos entre amostras de pilha
+    "PROFILING_MAX_CONCURRENT": 1,      # Requisições perfiladas ao mesmo tempo
+    "PROFILING_MAX_STORED": 50,         # Perfis mantidos em memória (/admin/perfis)
+    "EVENT_FEED_MAX_WAIT": 30,          # Segundos máximos de espera no long-poll de /reservas/eventos
+    "EVENT_FEED_POLL_INTERVAL": 0.5,    # Segundos entre consultas durante o long-poll
+    "OVERBOOKING_LIMIT_PERCENT": {      # Overbooking controlado por tipo (0 = desativado)
+        "SIMPLES": 0.0,
+        "DUPLO": 0.0,
+        "LUXO": 0.0
+    }
 }
\ No newline at end of file
@@ -1,26 +1,33 @@
 from datetime import date, timedelta
+from typing import List, Dict, Any
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from app.models import Reservation, Room, StatusReservation
+from app.models import Reservation, Room, RoomCharge, StatusReservation
 from app.settings import SETTINGS
 
+def calculate_daily_rate(room_price: float, day: date) -> float:
+    daily_rate = room_price
+
+    if day.weekday() >= 5:
+        daily_rate *= SETTINGS["WEEKEND_MULTIPLIER"]
+
+    if day.month in SETTINGS["HIGH_SEASON_MONTHS"]:
+        daily_rate *= SETTINGS["SEASON_MULTIPLIER"]
+
+    return daily_rate
+
 def calculate_total_price(room_price: float, check_in: date, check_out: date) -> float:
     total = 0.0
     current_date = check_in
     while current_date < check_out:
-        daily_rate = room_price
-        
-        if current_date.weekday() >= 5:
-            daily_rate *= SETTINGS["WEEKEND_MULTIPLIER"]
-        
-        if current_date.month in SETTINGS["HIGH_SEASON_MONTHS"]:
-            daily_rate *= SETTINGS["SEASON_MULTIPLIER"]
-            
-        total += daily_rate
+        total += calculate_daily_rate(room_price, current_date)
         current_date += timedelta(days=1)
     
     return round(total, 2)
 
 def is_room_available(db: Session, room_id: int, check_in: date, check_out: date) -> bool:
+    # caminho de escrita: consulta a tabela, não o modelo de leitura (que pode estar atrasado)
     overlapping = db.query(Reservation).filter(
         Reservation.room_id == room_id,
         Reservation.status.in_([StatusReservation.CONFIRMED, StatusReservation.CHECKIN]),
@@ -29,3 +36,87 @@ def is_room_available(db: Session, room_id: int, check_in: date, check_out: date
     ).first()
     
     return overlapping is None
+
+def build_charge_rows(reservation_id: int, room_id: int, room_price: float, start: date, end: date) -> List[Dict[str, Any]]:
+    rows = []
+    current_date = start
+    while current_date < end:
+        rows.append({
+            "reservation_id": reservation_id,
+            "room_id": room_id,
+            "date": current_date,
+            "value": calculate_daily_rate(room_price, current_date)
+        })
+        current_date += timedelta(days=1)
+    return rows
+
+def insert_charges(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Lança diárias ignorando noites já lançadas (UNIQUE reserva+data): auditoria e
+    checkout concorrentes na mesma reserva não falham. Retorna quantas entraram.
+    """
+    if not rows:
+        return 0
+    stmt = sqlite_insert(RoomCharge.__table__).on_conflict_do_nothing()
+    return db.connection().execute(stmt, rows).rowcount
+
+def posted_charges(db: Session, reservation_id: int):
+    """(noites lançadas, soma lançada) de uma reserva."""
+    count, total = db.query(func.count(RoomCharge.id), func.sum(RoomCharge.value)).filter(
+        RoomCharge.reservation_id == reservation_id
+    ).one()
+    return count, total or 0.0
+
+def posted_charges_many(db: Session, reservation_ids: List[int]) -> Dict[int, tuple]:
+    """Mesmo que posted_charges, para várias reservas em uma única consulta."""
+    if not reservation_ids:
+        return {}
+    rows = db.query(RoomCharge.reservation_id, func.count(RoomCharge.id), func.sum(RoomCharge.value)).filter(
+        RoomCharge.reservation_id.in_(reservation_ids)
+    ).group_by(RoomCharge.reservation_id).all()
+    return {res_id: (count, total or 0.0) for res_id, count, total in rows}
+
+def posted_in_period(db: Session, start: date, end: date) -> Dict[int, tuple]:
+    """
+    {reserva: (última noite lançada, soma lançada)} das diárias em [start, end).
+    As diárias de uma reserva são contíguas a partir do check-in, então toda noite
+    do período até a última lançada já está somada aqui.
+    """
+    rows = db.query(RoomCharge.reservation_id, func.max(RoomCharge.date), func.sum(RoomCharge.value)).filter(
+        RoomCharge.date >= start,
+        RoomCharge.date < end
+    ).group_by(RoomCharge.reservation_id).all()
+    return {res_id: (last, total) for res_id, last, total in rows}
+
+def posted_by_day(db: Session, start: date, end: date) -> Dict[date, float]:
+    """Soma das diárias lançadas por noite em [start, end)."""
+    rows = db.query(RoomCharge.date, func.sum(RoomCharge.value)).filter(
+        RoomCharge.date >= start,
+        RoomCharge.date < end
+    ).group_by(RoomCharge.date).all()
+    return dict(rows)
+
+def post_night_audit(db: Session, audit_date: date) -> int:
+    """
+    Lança as diárias de todas as reservas em CHECKIN até a noite de `audit_date`.
+    Retoma a partir da última noite lançada, então reexecutar não duplica lançamentos.
+    """
+    in_house = db.query(
+        Reservation.id, Reservation.room_id, Reservation.check_in, Reservation.check_out, Room.basic_fare
+    ).join(Room, Reservation.room_id == Room.id).filter(
+        Reservation.status == StatusReservation.CHECKIN
+    ).all()
+    if not in_house:
+        return 0
+
+    last_posted = dict(db.query(RoomCharge.reservation_id, func.max(RoomCharge.date)).filter(
+        RoomCharge.reservation_id.in_([r.id for r in in_house])
+    ).group_by(RoomCharge.reservation_id).all())
+
+    rows = []
+    for r in in_house:
+        start = last_posted[r.id] + timedelta(days=1) if r.id in last_posted else r.check_in
+        end = min(audit_date + timedelta(days=1), r.check_out)
+        rows.extend(build_charge_rows(r.id, r.room_id, r.basic_fare, start, end))
+
+    return insert_charges(db, rows)
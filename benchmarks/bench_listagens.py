@@ -0,0 +1,92 @@
+"""
+Benchmark das listagens de quartos e hóspedes: caminho antigo (objetos ORM validados
+um a um por RoomResponse/GuestResponse + encoder padrão) versus caminho rápido
+(consulta por colunas + ORJSONResponse).
+
+Uso: python -m benchmarks.bench_listagens [--linhas 5000] [--repeticoes 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas
+from app.database import Base
+from app.routers import hospedes, quartos
+
+def popular(db, linhas: int):
+    db.execute(insert(models.Room), [
+        {"number": i, "type": models.TypeRoom.SIMPLE, "capacity": 2,
+         "basic_fare": 100.0 + i % 50, "status": models.StatusRoom.AVAILABLE}
+        for i in range(1, linhas + 1)
+    ])
+    db.execute(insert(models.Guest), [
+        {"name": f"Hóspede {i}", "email": f"h{i}@bench.com", "phone": "0000"}
+        for i in range(1, linhas + 1)
+    ])
+    db.execute(insert(models.Document), [
+        {"type": models.TypeDocument.CPF, "number": f"{i:011d}", "guest_id": i}
+        for i in range(1, linhas + 1)
+    ])
+    db.commit()
+
+def antigo_quartos(db) -> bytes:
+    objs = db.query(models.Room).all()
+    validados = TypeAdapter(List[schemas.RoomResponse]).validate_python(objs, from_attributes=True)
+    return json.dumps(jsonable_encoder(validados)).encode()
+
+def antigo_hospedes(db) -> bytes:
+    objs = db.query(models.Guest).all()
+    validados = TypeAdapter(List[schemas.GuestResponse]).validate_python(objs, from_attributes=True)
+    return json.dumps(jsonable_encoder(validados)).encode()
+
+def novo_quartos(db) -> bytes:
+    return quartos.list_rooms(db).body
+
+def novo_hospedes(db) -> bytes:
+    return hospedes.list_guests(db).body
+
+def medir(Session, func, linhas: int, repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        db = Session()
+        try:
+            inicio = time.perf_counter()
+            func(db)
+            melhor = min(melhor, time.perf_counter() - inicio)
+        finally:
+            db.close()
+    return linhas / melhor
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        popular(db, args.linhas)
+        db.close()
+
+        for nome, antigo, novo in [
+            ("quartos", antigo_quartos, novo_quartos),
+            ("hospedes", antigo_hospedes, novo_hospedes),
+        ]:
+            antes = medir(Session, antigo, args.linhas, args.repeticoes)
+            depois = medir(Session, novo, args.linhas, args.repeticoes)
+            print(f"{nome:<10} antes: {antes:>10.0f} linhas/s  depois: {depois:>10.0f} linhas/s  ({depois / antes:.1f}x)")
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark do modelo de leitura: memória e tempo para carregar N reservas como objetos
+ORM `Reservation` versus o ReservationStore colunar (app/read_model.py).
+
+Uso: python -m benchmarks.bench_read_model [--reservas 50000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.read_model import ReadModelRegistry
+
+def popular(db, reservas: int):
+    db.execute(insert(models.Room), [
+        {"number": i, "type": models.TypeRoom.SIMPLE, "capacity": 2, "basic_fare": 100.0}
+        for i in range(1, 101)
+    ])
+    inicio = date(2020, 1, 1)
+    db.execute(insert(models.Reservation), [
+        {"room_id": i % 100 + 1, "guest_id": 1, "n_guests": 1,
+         "check_in": inicio + timedelta(days=i // 100), "check_out": inicio + timedelta(days=i // 100 + 2),
+         "status": models.StatusReservation.CHECKOUT}
+        for i in range(reservas)
+    ])
+    db.commit()
+
+def medir(carregar):
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = carregar()
+    duracao = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return resultado, duracao, memoria
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reservas", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        db = Session()
+        popular(db, args.reservas)
+        db.close()
+
+        db = Session()
+        objs, t_orm, m_orm = medir(lambda: db.query(models.Reservation).all())
+        del objs
+        db.close()
+
+        db = Session()
+        _, t_col, m_col = medir(lambda: ReadModelRegistry().get(db))
+        db.close()
+        engine.dispose()
+
+    n = args.reservas
+    print(f"ORM:       {m_orm / n:>7.0f} bytes/reserva  carga {t_orm:.2f}s")
+    print(f"colunar:   {m_col / n:>7.0f} bytes/reserva  carga {t_col:.2f}s  ({m_orm / m_col:.1f}x menos memória)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Teste de carga que simula um dia de recepção: vários terminais (usuários virtuais)
+disparam contra a API real uma mistura de buscas de disponibilidade, reservas,
+check-ins, pagamentos, adicionais, check-outs, cancelamentos e consultas de relatório,
+em proporções configuráveis. Ao final mostra vazão e latência p50/p95/p99 por operação.
+
+Sem --url a API roda no próprio processo (httpx.ASGITransport) sobre um banco
+temporário; com --url o alvo é um servidor já no ar (ex.: python run.py --workers 4).
+
+Uso: python -m benchmarks.bench_recepcao [--usuarios 16] [--requisicoes 2000]
+     [--mix reserva=20,relatorio=5] [--url http://127.0.0.1:8000] [--json resultado.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.utils import calculate_total_price
+
+# peso de cada operação no dia da recepção (proporções relativas)
+MIX_PADRAO = {
+    "disponibilidade": 30,
+    "reserva": 15,
+    "checkin": 10,
+    "pagamento": 10,
+    "adicional": 8,
+    "checkout": 10,
+    "cancelamento": 5,
+    "relatorio": 12,
+}
+
+class Recepcao:
+    """
+    Estado compartilhado pelos terminais: quartos, hóspedes e as reservas em cada etapa.
+    Cada operação retira a reserva da fila da etapa antes de chamar a API, então dois
+    terminais nunca mexem na mesma reserva ao mesmo tempo.
+    """
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.hoje = date.today()
+        self.tarifas: Dict[int, float] = {}     # room_id -> diária
+        self.hospedes: List[int] = []
+        self.chegadas: List[tuple] = []         # (res_id, room_id, check_out) com check-in hoje
+        self.hospedados: List[tuple] = []       # (res_id, saldo devedor)
+        self.quitados: List[int] = []
+        self.futuras: List[int] = []
+
+    def retirar(self, fila: list):
+        if not fila:
+            return None
+        return fila.pop(self.rng.randrange(len(fila)))
+
+async def disponibilidade(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    # quadro de quartos da recepção
+    return await client.get("/quartos/", headers=headers)
+
+async def reserva(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    # reserva antecipada (check-in nos próximos meses)
+    check_in = r.hoje + timedelta(days=r.rng.randint(1, 120))
+    resp = await client.post("/reservas/", headers=headers, json={
+        "guest_id": r.rng.choice(r.hospedes),
+        "room_id": r.rng.choice(list(r.tarifas)),
+        "check_in": check_in.isoformat(),
+        "check_out": (check_in + timedelta(days=r.rng.randint(1, 4))).isoformat(),
+        "n_guests": 1,
+    })
+    if resp.status_code == 201:
+        r.futuras.append(resp.json()["id"])
+    return resp
+
+async def checkin(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    chegada = r.retirar(r.chegadas)
+    if chegada is None:
+        return None
+    res_id, room_id, check_out = chegada
+    resp = await client.post(f"/reservas/{res_id}/checkin", headers=headers)
+    if resp.status_code == 200:
+        # mesma tarifa do checkout (fim de semana e alta temporada incluídos)
+        r.hospedados.append((res_id, calculate_total_price(r.tarifas[room_id], r.hoje, check_out)))
+    return resp
+
+async def pagamento(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    hospedado = r.retirar(r.hospedados)
+    if hospedado is None:
+        return None
+    res_id, saldo = hospedado
+    resp = await client.post(f"/reservas/{res_id}/pagamentos", headers=headers,
+                             json={"method": "CARTAO", "value": saldo})
+    if resp.status_code == 201:
+        r.quitados.append(res_id)
+    else:
+        r.hospedados.append(hospedado)
+    return resp
+
+async def adicional(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    hospedado = r.retirar(r.hospedados)
+    if hospedado is None:
+        return None
+    res_id, saldo = hospedado
+    valor = float(r.rng.choice([15, 25, 40, 80]))
+    resp = await client.post(f"/reservas/{res_id}/adicionais", headers=headers,
+                             json={"description": "Frigobar", "value": valor})
+    r.hospedados.append((res_id, saldo + valor if resp.status_code == 200 else saldo))
+    return resp
+
+async def checkout(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    res_id = r.retirar(r.quitados)
+    if res_id is None:
+        return None
+    return await client.post(f"/reservas/{res_id}/checkout", headers=headers)
+
+async def cancelamento(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    res_id = r.retirar(r.futuras)
+    if res_id is None:
+        return None
+    return await client.post(f"/reservas/{res_id}/cancel", headers=headers)
+
+async def relatorio(client: httpx.AsyncClient, r: Recepcao, headers: dict):
+    return await client.get("/relatorios/geral", headers=headers, params={
+        "start_date": (r.hoje - timedelta(days=30)).isoformat(),
+        "end_date": (r.hoje + timedelta(days=30)).isoformat(),
+    })
+
+OPERACOES = {
+    "disponibilidade": disponibilidade,
+    "reserva": reserva,
+    "checkin": checkin,
+    "pagamento": pagamento,
+    "adicional": adicional,
+    "checkout": checkout,
+    "cancelamento": cancelamento,
+    "relatorio": relatorio,
+}
+
+def parse_mix(texto: Optional[str]) -> Dict[str, int]:
+    """'reserva=20,relatorio=0' sobrescreve os pesos do MIX_PADRAO."""
+    mix = dict(MIX_PADRAO)
+    for item in filter(None, (texto or "").split(",")):
+        nome, _, peso = item.partition("=")
+        nome = nome.strip()
+        if nome not in OPERACOES:
+            raise ValueError(f"operação desconhecida: {nome}")
+        mix[nome] = int(peso)
+    if not any(mix.values()):
+        raise ValueError("o mix precisa de ao menos uma operação com peso > 0")
+    return mix
+
+def percentil(valores: List[float], q: float) -> float:
+    # nearest-rank sobre a lista ordenada
+    return valores[max(0, math.ceil(q * len(valores)) - 1)] if valores else 0.0
+
+async def cadastrar(client: httpx.AsyncClient, caminho: str, dados: dict) -> dict:
+    # a preparação respeita o rate limiting: espera o Retry-After e tenta de novo
+    while True:
+        resp = await client.post(caminho, json=dados)
+        if resp.status_code != 429:
+            resp.raise_for_status()
+            return resp.json()
+        await asyncio.sleep(float(resp.headers.get("Retry-After", 1)))
+
+async def preparar(client: httpx.AsyncClient, r: Recepcao, quartos: int, chegadas: int):
+    """Cadastra quartos e hóspedes e as chegadas do dia (fora da medição)."""
+    # números e e-mails únicos por execução, para rodar contra um banco já populado
+    tag = int(time.time() * 1000) % 10_000_000
+    for i in range(quartos):
+        quarto = await cadastrar(client, "/quartos/", {
+            "number": tag * 1000 + i, "type": "SIMPLES", "capacity": 2, "basic_fare": 100.0 + i % 5 * 50
+        })
+        r.tarifas[quarto["id"]] = quarto["basic_fare"]
+        hospede = await cadastrar(client, "/hospedes/", {
+            "name": f"Hóspede {i}", "email": f"h{i}.{tag}@carga.com", "phone": "0"
+        })
+        r.hospedes.append(hospede["id"])
+
+    for room_id in list(r.tarifas)[:chegadas]:
+        check_out = r.hoje + timedelta(days=r.rng.randint(1, 3))
+        reserva_do_dia = await cadastrar(client, "/reservas/", {
+            "guest_id": r.rng.choice(r.hospedes), "room_id": room_id,
+            "check_in": r.hoje.isoformat(), "check_out": check_out.isoformat(),
+            "n_guests": 1,
+        })
+        r.chegadas.append((reserva_do_dia["id"], room_id, check_out))
+
+async def executar(client: httpx.AsyncClient, mix: Dict[str, int], usuarios: int = 16,
+                   requisicoes: int = 2000, quartos: int = 300, chegadas: int = 250,
+                   semente: int = 42) -> dict:
+    """Prepara o hotel, roda o dia de recepção e devolve o resumo por operação."""
+    r = Recepcao(random.Random(semente))
+    await preparar(client, r, quartos, min(chegadas, quartos))
+
+    nomes = [nome for nome in mix if mix[nome] > 0]
+    pesos = [mix[nome] for nome in nomes]
+    latencias: Dict[str, List[float]] = defaultdict(list)
+    status: Dict[str, Counter] = defaultdict(Counter)
+    substituidas: Counter = Counter()
+    restantes = requisicoes
+
+    async def terminal(n: int):
+        nonlocal restantes
+        # cada terminal é um cliente distinto para o rate limit (vale quando o
+        # servidor confia no endereço de origem: TRUSTED_PROXIES)
+        headers = {"X-Forwarded-For": f"10.0.{n // 250}.{n % 250 + 1}"}
+        while restantes > 0:
+            restantes -= 1
+            nome = r.rng.choices(nomes, pesos)[0]
+            inicio = time.perf_counter()
+            resp = await OPERACOES[nome](client, r, headers)
+            if resp is None:
+                # nenhuma reserva na etapa certa: o terminal faz uma busca no lugar
+                substituidas[nome] += 1
+                nome = "disponibilidade"
+                inicio = time.perf_counter()
+                resp = await disponibilidade(client, r, headers)
+            latencias[nome].append(time.perf_counter() - inicio)
+            status[nome][resp.status_code] += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(terminal(n) for n in range(usuarios)))
+    duracao = time.perf_counter() - inicio
+
+    def resumir(valores: List[float], codigos: Counter) -> dict:
+        valores = sorted(valores)
+        return {
+            "requisicoes": len(valores),
+            "req_s": round(len(valores) / duracao, 1),
+            "p50_ms": round(percentil(valores, 0.50) * 1000, 2),
+            "p95_ms": round(percentil(valores, 0.95) * 1000, 2),
+            "p99_ms": round(percentil(valores, 0.99) * 1000, 2),
+            "status": {str(c): n for c, n in sorted(codigos.items())},
+        }
+
+    todas = [v for valores in latencias.values() for v in valores]
+    return {
+        "config": {"usuarios": usuarios, "requisicoes": requisicoes, "quartos": quartos,
+                   "chegadas": chegadas, "mix": mix, "semente": semente},
+        "duracao_s": round(duracao, 2),
+        "operacoes": {nome: resumir(latencias[nome], status[nome]) for nome in OPERACOES if latencias[nome]},
+        "substituidas": dict(substituidas),
+        "total": resumir(todas, sum(status.values(), Counter())),
+    }
+
+def imprimir(resultado: dict):
+    print(f"{resultado['config']['usuarios']} terminais, {resultado['total']['requisicoes']} requisições "
+          f"em {resultado['duracao_s']:.2f}s")
+    print(f"{'operação':<16}{'n':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status")
+    linhas = list(resultado["operacoes"].items()) + [("TOTAL", resultado["total"])]
+    for nome, op in linhas:
+        codigos = " ".join(f"{c}:{n}" for c, n in op["status"].items())
+        print(f"{nome:<16}{op['requisicoes']:>7}{op['req_s']:>9.1f}{op['p50_ms']:>9.2f}"
+              f"{op['p95_ms']:>9.2f}{op['p99_ms']:>9.2f}  {codigos}")
+    if resultado["substituidas"]:
+        trocas = ", ".join(f"{nome}: {n}" for nome, n in resultado["substituidas"].items())
+        print(f"sem reserva elegível (viraram busca de disponibilidade): {trocas}")
+
+def cliente_local(tmp: str, sem_limite: bool) -> httpx.AsyncClient:
+    # API no próprio processo, sobre um banco SQLite temporário
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base, get_db
+    from app.main import app
+    from app.settings import SETTINGS
+
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'carga.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    SETTINGS["TRUSTED_PROXIES"] = ["127.0.0.1"]     # endereço da ASGITransport
+    if sem_limite:
+        SETTINGS["RATE_LIMIT_ENABLED"] = False
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://recepcao", timeout=60)
+
+async def principal(args):
+    mix = parse_mix(args.mix)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=60)
+        else:
+            client = cliente_local(tmp, args.sem_limite)
+        async with client:
+            return await executar(client, mix, args.usuarios, args.requisicoes,
+                                  args.quartos, args.chegadas, args.semente)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--usuarios", type=int, default=16, help="terminais simultâneos")
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--mix", help="pesos por operação, ex.: reserva=20,relatorio=5")
+    parser.add_argument("--quartos", type=int, default=300)
+    parser.add_argument("--chegadas", type=int, default=250, help="reservas com check-in hoje")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--url", help="servidor já no ar; sem isso a API roda no processo")
+    parser.add_argument("--sem-limite", action="store_true",
+                        help="desliga o rate limiting (só no modo local)")
+    parser.add_argument("--json", help="grava o resultado em JSON (para comparar execuções)")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(principal(args))
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
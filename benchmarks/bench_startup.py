@@ -0,0 +1,88 @@
+"""
+Benchmark de inicialização: tempo de import de `app.main` (via `python -X importtime`)
+e tempo até a primeira requisição respondida (import + lifespan + GET /).
+
+Cada medição roda em um processo novo, num diretório temporário (o hotel.db criado
+no startup não polui o projeto). Com --registrar o resultado é anexado ao histórico
+em benchmarks/historico_startup.jsonl, para acompanhar a evolução entre commits.
+
+Uso: python -m benchmarks.bench_startup [--repeticoes 5] [--registrar]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORICO = os.path.join(RAIZ, "benchmarks", "historico_startup.jsonl")
+
+PRIMEIRA_REQUISICAO = """
+import time
+inicio = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+with TestClient(app) as client:
+    assert client.get("/").status_code == 200
+print(time.perf_counter() - inicio)
+"""
+
+def _executar(args, cwd):
+    env = dict(os.environ, PYTHONPATH=RAIZ)
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+
+def medir_import(cwd) -> float:
+    """Tempo cumulativo de `app.main` em ms, segundo -X importtime."""
+    saida = _executar(["-X", "importtime", "-c", "import app.main"], cwd).stderr
+    for linha in saida.splitlines():
+        partes = [p.strip() for p in linha.split("|")]
+        if len(partes) == 3 and partes[2] == "app.main":
+            return int(partes[1]) / 1000
+    raise RuntimeError("app.main não encontrado na saída do importtime")
+
+def medir_primeira_requisicao(cwd) -> float:
+    """Tempo em ms do início do processo até a resposta do primeiro GET /."""
+    return float(_executar(["-c", PRIMEIRA_REQUISICAO], cwd).stdout.strip()) * 1000
+
+def _commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--registrar", action="store_true", help="anexa o resultado ao histórico")
+    args = parser.parse_args()
+
+    imports, requisicoes = [], []
+    for _ in range(args.repeticoes):
+        with tempfile.TemporaryDirectory() as tmp:
+            imports.append(medir_import(tmp))
+            requisicoes.append(medir_primeira_requisicao(tmp))
+
+    resultado = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": sys.version.split()[0],
+        "import_app_main_ms": round(statistics.median(imports), 1),
+        "primeira_requisicao_ms": round(statistics.median(requisicoes), 1),
+    }
+    print(f"import app.main:     {resultado['import_app_main_ms']:>8.1f} ms (mediana de {args.repeticoes})")
+    print(f"primeira requisição: {resultado['primeira_requisicao_ms']:>8.1f} ms (mediana de {args.repeticoes})")
+
+    if args.registrar:
+        with open(HISTORICO, "a", encoding="utf-8") as f:
+            f.write(json.dumps(resultado) + "\n")
+        print(f"registrado em {os.path.relpath(HISTORICO, RAIZ)}")
+
+if __name__ == "__main__":
+    main()
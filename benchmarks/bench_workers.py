@@ -0,0 +1,87 @@
+"""
+Teste de carga do modo multi-worker: sobe `run.py --workers N` para cada N pedido,
+popula quartos e hóspedes e mede a vazão de listagens (GET /quartos/ e /hospedes/)
+com vários clientes simultâneos. Mostra quanto a vazão escala com os workers
+(limitado pelo número de núcleos da máquina).
+
+Uso: python -m benchmarks.bench_workers [--workers 1 2 4] [--requisicoes 400] [--clientes 16]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def aguardar(url: str, timeout: float = 30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(url).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"servidor não respondeu em {url}")
+
+def popular(base: str, quartos: int):
+    with httpx.Client(base_url=base) as client:
+        for i in range(quartos):
+            client.post("/quartos/", json={"number": i + 1, "type": "SIMPLES", "capacity": 2, "basic_fare": 100.0})
+            client.post("/hospedes/", json={"name": f"Hóspede {i}", "email": f"h{i}@carga.com", "phone": "0"})
+
+def disparar(base: str, requisicoes: int, clientes: int) -> float:
+    caminhos = ["/quartos/", "/hospedes/"]
+
+    def trabalho(n: int):
+        with httpx.Client(base_url=base, timeout=30) as client:
+            for i in range(n):
+                client.get(caminhos[i % 2]).raise_for_status()
+
+    por_cliente = requisicoes // clientes
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as executor:
+        list(executor.map(trabalho, [por_cliente] * clientes))
+    return por_cliente * clientes / (time.perf_counter() - inicio)
+
+def medir(workers: int, porta: int, args) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, PYTHONPATH=RAIZ)
+        servidor = subprocess.Popen(
+            [sys.executable, os.path.join(RAIZ, "run.py"), "--workers", str(workers), "--port", str(porta)],
+            cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            base = f"http://127.0.0.1:{porta}"
+            aguardar(base + "/")
+            popular(base, args.quartos)
+            disparar(base, args.clientes * 2, args.clientes)  # aquecimento
+            return disparar(base, args.requisicoes, args.clientes)
+        finally:
+            servidor.send_signal(signal.SIGINT)
+            servidor.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requisicoes", type=int, default=400)
+    parser.add_argument("--clientes", type=int, default=16)
+    parser.add_argument("--quartos", type=int, default=200)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"núcleos disponíveis: {os.cpu_count()}")
+    base = None
+    for workers in args.workers:
+        vazao = medir(workers, args.porta, args)
+        base = base or vazao
+        print(f"{workers:>2} worker(s): {vazao:>8.1f} req/s  ({vazao / base:.2f}x)")
+
+if __name__ == "__main__":
+    main()
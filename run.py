@@ -1,4 +1,34 @@
+import argparse
+import os
 import uvicorn
 
+def main():
+    parser = argparse.ArgumentParser(description="Servidor da API de reservas.")
+    parser.add_argument("--workers", type=int, help="processos worker (modo produção); omitido = desenvolvimento com reload")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--coordination-db", default="coordenacao.db",
+                        help="SQLite de versões compartilhado entre os workers")
+    args = parser.parse_args()
+
+    if args.workers is None:
+        # desenvolvimento: um processo com auto-reload
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True)
+        return
+
+    # produção: schema criado uma vez aqui, antes dos workers subirem
+    from app.database import init_db
+    init_db()
+
+    # os workers herdam o ambiente: caches coordenados pelo mesmo arquivo de versões
+    os.environ["HOTEL_CREATE_SCHEMA_ON_STARTUP"] = "0"
+    os.environ["HOTEL_COORDINATION_DB"] = os.path.abspath(args.coordination_db)
+
+    # SIGHUP reinicia os workers um a um; SIGTERM/SIGINT encerra após as requisições em curso
+    uvicorn.run(
+        "app.main:app", host=args.host, port=args.port, workers=args.workers,
+        timeout_graceful_shutdown=30
+    )
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
+    main()
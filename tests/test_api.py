@@ -1,9 +1,12 @@
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.database import Base, get_db
+from app.database import Base, get_db, engine_pool
 from app.main import app
+from app.limiter import limiter
+from app.read_model import read_store
 from app.settings import SETTINGS
+from app import idempotency, models, utils
 from datetime import date, timedelta
 import pytest
 
@@ -31,6 +34,12 @@ def setup_database():
     yield
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def clientes_por_forwarded_for(monkeypatch):
+    # o TestClient conecta sempre como "testclient": cada teste se identifica
+    # no rate limit pelo X-Forwarded-For, como atrás de um proxy confiável
+    monkeypatch.setitem(SETTINGS, "TRUSTED_PROXIES", ["testclient"])
+
 def test_criar_entidades_basicas():
     """cria base p/ testes"""
     # quarto 101 (p/ testes de erro)
@@ -160,4 +169,620 @@ def test_relatorios_metricas():
     
     assert "taxa_ocupacao_percentual" in data["metricas"]
     assert "revpar" in data["metricas"]
-    assert "adr" in data["metricas"]
\ No newline at end of file
+    assert "adr" in data["metricas"]
+
+def test_auditoria_noturna_idempotente():
+    """lanca diarias por noite sem duplicar"""
+    room = client.post("/quartos/", json={
+        "number": 103, "type": "SIMPLES", "capacity": 2, "basic_fare": 100.0
+    }).json()
+    c_in = date.today()
+    c_out = c_in + timedelta(days=3)
+    r = client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1
+    })
+    res_id = r.json()["id"]
+    client.post(f"/reservas/{res_id}/checkin")
+
+    # primeira noite
+    audit = client.post(f"/reservas/rotinas/auditoria-noturna?data={c_in}")
+    assert audit.status_code == 200
+    assert client.get(f"/reservas/{res_id}/folio").json()["noites_lancadas"] == 1
+
+    # reexecucao nao duplica; dia seguinte retoma
+    client.post(f"/reservas/rotinas/auditoria-noturna?data={c_in}")
+    client.post(f"/reservas/rotinas/auditoria-noturna?data={c_in + timedelta(days=1)}")
+    folio = client.get(f"/reservas/{res_id}/folio").json()
+    assert folio["noites_lancadas"] == 2
+
+    # checkout completa as noites restantes
+    total = utils.calculate_total_price(100.0, c_in, c_out)
+    client.post(f"/reservas/{res_id}/pagamentos", json={"method": "PIX", "value": total})
+    checkout = client.post(f"/reservas/{res_id}/checkout")
+    assert checkout.status_code == 200
+    assert checkout.json()["financeiro"]["total_servicos"] == total
+    folio = client.get(f"/reservas/{res_id}/folio").json()
+    assert folio["noites_lancadas"] == 3
+    assert folio["total_diarias"] == total
+
+def test_checkout_concorrente_com_auditoria(monkeypatch):
+    """auditoria lanca noite entre a leitura e o insert do checkout: sem erro e sem cobrar em dobro"""
+    room = client.post("/quartos/", json={
+        "number": 108, "type": "SIMPLES", "capacity": 2, "basic_fare": 100.0
+    }).json()
+    c_in = date.today()
+    c_out = c_in + timedelta(days=2)
+    res_id = client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1
+    }).json()["id"]
+    client.post(f"/reservas/{res_id}/checkin")
+    client.post(f"/reservas/rotinas/auditoria-noturna?data={c_in}")
+
+    # checkout le o folio antes da auditoria lancar a primeira noite
+    original = utils.posted_charges
+    leituras = []
+    def leitura_atrasada(db, reservation_id):
+        leituras.append(reservation_id)
+        return (0, 0.0) if len(leituras) == 1 else original(db, reservation_id)
+    monkeypatch.setattr(utils, "posted_charges", leitura_atrasada)
+
+    total = utils.calculate_total_price(100.0, c_in, c_out)
+    client.post(f"/reservas/{res_id}/pagamentos", json={"method": "PIX", "value": total})
+    checkout = client.post(f"/reservas/{res_id}/checkout")
+    assert checkout.status_code == 200
+    assert checkout.json()["financeiro"]["total_servicos"] == total
+    folio = client.get(f"/reservas/{res_id}/folio").json()
+    assert folio["noites_lancadas"] == 2
+    assert folio["total_diarias"] == total
+
+def test_listagens_mesmo_formato_do_detalhe():
+    """listagem rapida devolve o mesmo json do endpoint de detalhe"""
+    quartos = client.get("/quartos/").json()
+    assert quartos[0] == client.get(f"/quartos/{quartos[0]['id']}").json()
+
+    client.post("/hospedes/", json={
+        "name": "Com Documento", "email": "doc@test.com", "phone": "1",
+        "documents": [{"type": "CPF", "number": "111.111.111-11"}]
+    })
+    hospedes = client.get("/hospedes/").json()
+    for h in hospedes:
+        assert h == client.get(f"/hospedes/{h['id']}").json()
+    assert any(h["documents"] for h in hospedes)
+
+def test_cache_catalogo_quartos():
+    """catalogo invalida ao criar quarto e serve leituras sem consulta"""
+    antes = client.get("/quartos/catalogo/estatisticas").json()
+    client.post("/quartos/", json={
+        "number": 104, "type": "DUPLO", "capacity": 2, "basic_fare": 180.0
+    })
+    depois = client.get("/quartos/catalogo/estatisticas").json()
+    assert depois["versao"] == antes["versao"] + 1
+
+    # duplicado detectado pelo catalogo recarregado
+    dup = client.post("/quartos/", json={
+        "number": 104, "type": "DUPLO", "capacity": 2, "basic_fare": 180.0
+    })
+    assert dup.status_code == 400
+    stats = client.get("/quartos/catalogo/estatisticas").json()
+    assert stats["misses"] == depois["misses"] + 1
+    assert stats["quartos"] == len(client.get("/quartos/").json())
+
+def test_operacoes_em_lote():
+    """checkin, pagamento e checkout de um grupo em transacao unica"""
+    c_in = date.today()
+    c_out = c_in + timedelta(days=1)
+    ids = []
+    for number in (501, 502):
+        room = client.post("/quartos/", json={
+            "number": number, "type": "SIMPLES", "capacity": 2, "basic_fare": 90.0
+        }).json()
+        r = client.post("/reservas/", json={
+            "guest_id": 1, "room_id": room["id"], "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1
+        })
+        ids.append(r.json()["id"])
+
+    # atomico: id inexistente desfaz tudo
+    falha = client.post("/reservas/lote/checkin", json={"ids": ids + [9999], "atomic": True})
+    assert falha.status_code == 409
+    assert client.post("/reservas/lote/checkin", json={"ids": ids}).json()["sucessos"] == 2
+
+    # parcial: segundo checkin do mesmo grupo falha item a item
+    repetido = client.post("/reservas/lote/checkin", json={"ids": ids}).json()
+    assert repetido["falhas"] == 2
+
+    total = utils.calculate_total_price(90.0, c_in, c_out)
+    pag = client.post("/reservas/lote/pagamentos", json={
+        "payments": [{"reservation_id": i, "method": "PIX", "value": total} for i in ids]
+    })
+    assert pag.status_code == 201
+    out = client.post("/reservas/lote/checkout", json={"ids": ids}).json()
+    assert out["sucessos"] == 2
+    assert all(r["financeiro"]["troco"] == 0 for r in out["resultados"])
+
+def test_previsao_e_overbooking_controlado(monkeypatch):
+    """taxa historica de no-show reduz a ocupacao esperada e libera overbooking"""
+    room = client.post("/quartos/", json={
+        "number": 601, "type": "LUXO", "capacity": 2, "basic_fare": 300.0
+    }).json()
+    ontem = date.today() - timedelta(days=1)
+    client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(ontem), "check_out": str(date.today()), "n_guests": 1
+    })
+    client.post("/reservas/rotinas/processar-no-show")
+
+    c_in = date.today() + timedelta(days=1)
+    c_out = c_in + timedelta(days=2)
+    nova = {"guest_id": 1, "room_id": room["id"], "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1}
+    assert client.post("/reservas/", json=nova).status_code == 201
+
+    prev = client.get(f"/relatorios/previsao?start_date={c_in}&end_date={c_out}").json()
+    assert prev["taxas_historicas"]["LUXO"][0]["no_show"] == 1.0
+    luxo = prev["previsao"][0]["por_tipo"]["LUXO"]
+    assert luxo == {"reservados": 1, "esperados": 0.0}
+
+    # sem limite configurado o quarto continua indisponivel
+    assert client.post("/reservas/", json=nova).status_code == 400
+    monkeypatch.setitem(SETTINGS["OVERBOOKING_LIMIT_PERCENT"], "LUXO", 1.0)
+    assert client.post("/reservas/", json=nova).status_code == 201
+    assert client.post("/reservas/", json=nova).status_code == 400
+
+def test_overbooking_so_sem_quarto_livre_do_tipo(monkeypatch):
+    """overbooking nao empilha reservas enquanto houver quarto do tipo livre; check-in nao duplica ocupacao"""
+    quartos = [client.post("/quartos/", json={
+        "number": n, "type": "LUXO", "capacity": 2, "basic_fare": 300.0
+    }).json() for n in (611, 612)]
+    ontem = date.today() - timedelta(days=1)
+    client.post("/reservas/", json={
+        "guest_id": 1, "room_id": quartos[0]["id"], "check_in": str(ontem), "check_out": str(date.today()), "n_guests": 1
+    })
+    client.post("/reservas/rotinas/processar-no-show")
+    monkeypatch.setitem(SETTINGS["OVERBOOKING_LIMIT_PERCENT"], "LUXO", 1.0)
+
+    c_in, c_out = date.today(), date.today() + timedelta(days=1)
+    def reservar(room_id):
+        return client.post("/reservas/", json={
+            "guest_id": 1, "room_id": room_id, "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1
+        })
+    primeira = reservar(quartos[0]["id"])
+    assert primeira.status_code == 201
+
+    # outro quarto LUXO livre: recusa em vez de empilhar no 611
+    recusada = reservar(quartos[0]["id"])
+    assert recusada.status_code == 400
+    assert "mesmo tipo livre" in recusada.json()["detail"]
+
+    # todos os LUXO ocupados: overbooking liberado
+    for q in client.get("/quartos/").json():
+        if q["type"] == "LUXO" and q["id"] != quartos[0]["id"]:
+            assert reservar(q["id"]).status_code == 201
+    extra = reservar(quartos[0]["id"])
+    assert extra.status_code == 201
+
+    # so uma das reservas do quarto faz check-in
+    assert client.post(f"/reservas/{primeira.json()['id']}/checkin").status_code == 200
+    bloqueado = client.post(f"/reservas/{extra.json()['id']}/checkin")
+    assert bloqueado.status_code == 400
+    assert "CHECKIN" in bloqueado.json()["detail"]
+
+def test_propriedades_em_bancos_separados(monkeypatch, tmp_path):
+    """header X-Property-Id roteia para o banco da propriedade; consolidado soma todas"""
+    monkeypatch.setitem(SETTINGS, "PROPERTY_DATABASE_URL", f"sqlite:///{tmp_path}/hotel_{{property_id}}.db")
+    monkeypatch.setitem(SETTINGS, "PROPERTY_IDS", [901, 902])
+    monkeypatch.delitem(app.dependency_overrides, get_db)
+    try:
+        for pid, quartos in ((901, 2), (902, 3)):
+            for n in range(quartos):
+                r = client.post("/quartos/", headers={"X-Property-Id": str(pid)}, json={
+                    "number": 100 + n, "type": "SIMPLES", "capacity": 1, "basic_fare": 100.0
+                })
+                assert r.status_code == 201
+        assert len(client.get("/quartos/", headers={"X-Property-Id": "901"}).json()) == 2
+        assert len(client.get("/quartos/", headers={"X-Property-Id": "902"}).json()) == 3
+
+        start, end = date.today(), date.today() + timedelta(days=10)
+        rel = client.get(
+            f"/relatorios/geral/consolidado?start_date={start}&end_date={end}&propriedades=901&propriedades=902"
+        ).json()
+        assert rel["metricas"]["room_nights_disponiveis"] == 50
+        assert rel["por_propriedade"]["901"]["room_nights_disponiveis"] == 20
+
+        # propriedade fora da configuração: 404 e nenhum banco criado
+        assert client.get("/quartos/", headers={"X-Property-Id": "903"}).status_code == 404
+        assert client.get(
+            f"/relatorios/geral/consolidado?start_date={start}&end_date={end}&propriedades=901&propriedades=903"
+        ).status_code == 404
+        assert not (tmp_path / "hotel_903.db").exists()
+    finally:
+        engine_pool.dispose_all()
+
+def test_feed_de_eventos():
+    """cada mudanca de status vira evento consumivel por cursor"""
+    cursor = client.get("/reservas/eventos?limit=1000").json()["cursor"]
+    room = client.post("/quartos/", json={
+        "number": 701, "type": "SIMPLES", "capacity": 1, "basic_fare": 80.0
+    }).json()
+    r = client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(date.today()),
+        "check_out": str(date.today() + timedelta(days=1)), "n_guests": 1
+    })
+    res_id = r.json()["id"]
+    client.post(f"/reservas/{res_id}/checkin")
+
+    feed = client.get(f"/reservas/eventos?since={cursor}").json()
+    assert [(e["reservation_id"], e["status"]) for e in feed["eventos"]] == [
+        (res_id, "CONFIRMADA"), (res_id, "CHECKIN")
+    ]
+
+    # long-poll sem novidades devolve vazio com o mesmo cursor
+    vazio = client.get(f"/reservas/eventos?since={feed['cursor']}&wait=0.1").json()
+    assert vazio == {"eventos": [], "cursor": feed["cursor"]}
+
+def test_idempotency_key_em_pagamentos(monkeypatch, tmp_path):
+    """repeticao com a mesma chave devolve a resposta guardada sem pagar duas vezes"""
+    monkeypatch.setitem(SETTINGS, "IDEMPOTENCY_DB", str(tmp_path / "idem.db"))
+    idempotency.store.close()
+    try:
+        room = client.post("/quartos/", json={
+            "number": 801, "type": "SIMPLES", "capacity": 1, "basic_fare": 80.0
+        }).json()
+        headers = {"Idempotency-Key": "reserva-801"}
+        body = {"guest_id": 1, "room_id": room["id"], "check_in": str(date.today() + timedelta(days=40)),
+                "check_out": str(date.today() + timedelta(days=41)), "n_guests": 1}
+        r1 = client.post("/reservas/", json=body, headers=headers)
+        r2 = client.post("/reservas/", json=body, headers=headers)
+        assert r1.status_code == r2.status_code == 201
+        assert r2.json() == r1.json()
+        assert r2.headers["Idempotent-Replayed"] == "true"
+
+        res_id = r1.json()["id"]
+        pag = {"Idempotency-Key": "pag-1"}
+        for _ in range(3):
+            client.post(f"/reservas/{res_id}/pagamentos", json={"method": "PIX", "value": 50.0}, headers=pag)
+        assert client.get(f"/reservas/{res_id}/folio").json()["total_pago"] == 50.0
+
+        # mesma chave com outro corpo e rejeitada
+        outro = client.post(f"/reservas/{res_id}/pagamentos", json={"method": "PIX", "value": 10.0}, headers=pag)
+        assert outro.status_code == 422
+
+        # parametros na query string entram na comparacao
+        status = {"Idempotency-Key": "status-801"}
+        url = f"/quartos/{room['id']}/status"
+        assert client.patch(f"{url}?new_status=MANUTENCAO", headers=status).status_code == 200
+        assert client.patch(f"{url}?new_status=MANUTENCAO", headers=status).headers["Idempotent-Replayed"] == "true"
+        assert client.patch(f"{url}?new_status=DISPONIVEL", headers=status).status_code == 422
+        assert client.get(f"/quartos/{room['id']}").json()["status"] == "MANUTENCAO"
+    finally:
+        idempotency.store.close()
+
+def test_idempotency_key_abandonada_expira(monkeypatch, tmp_path):
+    """chave em andamento de um worker morto volta a ser usável depois do lease"""
+    monkeypatch.setitem(SETTINGS, "IDEMPOTENCY_DB", str(tmp_path / "idem.db"))
+    idempotency.store.close()
+    try:
+        assert idempotency.store.reserve("chave", "fp")
+        assert not idempotency.store.reserve("chave", "fp")
+        monkeypatch.setitem(SETTINGS, "IDEMPOTENCY_LEASE", -1)
+        assert idempotency.store.reserve("chave", "fp")
+
+        # reserva concluída não é afetada pelo lease
+        idempotency.store.save("chave", 201, b"{}", "application/json")
+        assert not idempotency.store.reserve("chave", "fp")
+    finally:
+        idempotency.store.close()
+
+def test_limite_de_taxa_e_descarte_de_carga(monkeypatch):
+    """excesso por cliente gera 429; grupo sem vaga gera 503, ambos com Retry-After"""
+    relatorios = dict(SETTINGS["LOAD_GROUPS"]["relatorios"], rate=0.5, burst=1)
+    monkeypatch.setitem(SETTINGS["LOAD_GROUPS"], "relatorios", relatorios)
+    url = f"/relatorios/geral?start_date={date.today()}&end_date={date.today() + timedelta(days=1)}"
+    headers = {"X-Forwarded-For": "10.0.0.1"}
+
+    assert client.get(url, headers=headers).status_code == 200
+    excesso = client.get(url, headers=headers)
+    assert excesso.status_code == 429
+    assert int(excesso.headers["Retry-After"]) >= 1
+
+    # outro cliente nao e afetado, mas relatorios sem vaga sao descartados
+    monkeypatch.setitem(limiter.in_flight, "relatorios", relatorios["max_concurrency"])
+    cheio = client.get(url, headers={"X-Forwarded-For": "10.0.0.2"})
+    assert cheio.status_code == 503
+    assert "Retry-After" in cheio.headers
+
+def test_limite_de_taxa_identifica_cliente_pelo_ip(monkeypatch):
+    """headers do cliente não trocam de balde; o mapa de baldes é limitado (LRU)"""
+    monkeypatch.setitem(SETTINGS, "TRUSTED_PROXIES", [])
+    relatorios = dict(SETTINGS["LOAD_GROUPS"]["relatorios"], rate=0.5, burst=1)
+    monkeypatch.setitem(SETTINGS["LOAD_GROUPS"], "relatorios", relatorios)
+    monkeypatch.setattr(limiter, "buckets", type(limiter.buckets)())
+    url = f"/relatorios/geral?start_date={date.today()}&end_date={date.today() + timedelta(days=1)}"
+
+    assert client.get(url, headers={"X-Client-Id": "a", "X-Forwarded-For": "10.1.0.1"}).status_code == 200
+    rodizio = client.get(url, headers={"X-Client-Id": "b", "X-Forwarded-For": "10.1.0.2"})
+    assert rodizio.status_code == 429
+
+    monkeypatch.setattr(limiter, "MAX_BUCKETS", 2)
+    for ip in ("10.1.0.1", "10.1.0.2", "10.1.0.3"):
+        limiter.check_rate("relatorios", ip)
+    assert list(limiter.buckets) == [("relatorios", "10.1.0.2"), ("relatorios", "10.1.0.3")]
+
+def test_arquivamento_preserva_relatorios():
+    """reservas antigas saem das tabelas quentes e continuam nos relatorios"""
+    room = client.post("/quartos/", json={
+        "number": 902, "type": "DUPLO", "capacity": 2, "basic_fare": 200.0
+    }).json()
+    c_in = date(date.today().year - 2, 3, 2)
+    c_out = c_in + timedelta(days=2)
+    res_id = client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(c_in), "check_out": str(c_out), "n_guests": 1
+    }).json()["id"]
+    client.post(f"/reservas/{res_id}/checkin")
+    client.post(f"/reservas/{res_id}/pagamentos", json={
+        "method": "PIX", "value": utils.calculate_total_price(200.0, c_in, c_out)
+    })
+    assert client.post(f"/reservas/{res_id}/checkout").status_code == 200
+
+    url = f"/relatorios/geral?start_date={c_in - timedelta(days=5)}&end_date={c_out + timedelta(days=5)}"
+    antes = client.get(url, headers={"X-Forwarded-For": "10.0.0.3"}).json()
+
+    arquivadas = client.post("/reservas/rotinas/arquivar?horizonte_dias=30").json()
+    assert arquivadas["message"].startswith("1 ")
+    assert client.get(f"/reservas/{res_id}/folio").status_code == 404
+
+    depois = client.get(url, headers={"X-Forwarded-For": "10.0.0.3"}).json()
+    assert depois["metricas"] == antes["metricas"]
+    assert depois["metricas"]["room_nights_vendidas"] == 2
+
+def test_arquivamento_nao_reutiliza_ids():
+    """arquivar a reserva de maior id não devolve o id para a próxima reserva"""
+    room = client.post("/quartos/", json={
+        "number": 906, "type": "SIMPLES", "capacity": 1, "basic_fare": 100.0
+    }).json()
+    c_in = date(date.today().year - 2, 5, 4)
+    antiga = {"guest_id": 1, "room_id": room["id"], "check_in": str(c_in),
+              "check_out": str(c_in + timedelta(days=1)), "n_guests": 1}
+    res_id = client.post("/reservas/", json=antiga).json()["id"]
+    client.post(f"/reservas/{res_id}/cancel")
+    cursor = client.get("/reservas/eventos?limit=1000").json()["cursor"]
+    assert client.post("/reservas/rotinas/arquivar?horizonte_dias=30").json()["message"].startswith("1 ")
+
+    # mesma reserva de novo: id novo, eventos sem mistura, e o arquivamento seguinte não colide
+    novo_id = client.post("/reservas/", json=antiga).json()["id"]
+    assert novo_id > res_id
+    client.post(f"/reservas/{novo_id}/cancel")
+    feed = client.get(f"/reservas/eventos?since={cursor}").json()["eventos"]
+    assert {e["reservation_id"] for e in feed} == {novo_id}
+    assert client.post("/reservas/rotinas/arquivar?horizonte_dias=30").status_code == 200
+
+def test_relatorio_segmentado_colunar():
+    """segmentos por tipo e por dia somam os totais do periodo"""
+    headers = {"X-Forwarded-For": "10.0.0.4"}
+    start, end = date.today(), date.today() + timedelta(days=14)
+    base = f"/relatorios/geral?start_date={start}&end_date={end}"
+
+    por_tipo = client.get(base + "&group_by=type", headers=headers).json()
+    seg = por_tipo["segmentos"]
+    assert seg["group_by"] == "type"
+    assert set(seg["chave"]) == {"SIMPLES", "DUPLO", "LUXO"}
+    assert sum(seg["room_nights_vendidas"]) == por_tipo["metricas"]["room_nights_vendidas"]
+    assert sum(seg["room_nights_disponiveis"]) == por_tipo["metricas"]["room_nights_disponiveis"]
+
+    por_dia = client.get(base + "&group_by=day", headers=headers).json()["segmentos"]
+    assert len(por_dia["chave"]) == 14
+    assert sum(por_dia["receita"]) == pytest.approx(por_tipo["metricas"]["receita_total_hospedagem"], abs=0.05)
+
+    assert client.get(base + "&group_by=andar", headers=headers).status_code == 422
+
+def test_profiling_por_requisicao(monkeypatch):
+    """header X-Profile (com token de admin) captura perfil listado em /admin/perfis"""
+    monkeypatch.setitem(SETTINGS, "ADMIN_TOKEN", "segredo")
+    url = f"/relatorios/geral?start_date={date.today()}&end_date={date.today() + timedelta(days=365)}"
+    admin = {"X-Admin-Token": "segredo"}
+    headers = {"X-Profile": "1", "X-Forwarded-For": "10.0.0.5", **admin}
+
+    # desligado: nenhum perfil capturado
+    assert "X-Profile-Id" not in client.get(url, headers=headers).headers
+
+    # ligado, mas sem token: header ignorado e /admin fechado
+    monkeypatch.setitem(SETTINGS, "PROFILING_ENABLED", True)
+    sem_token = {"X-Profile": "1", "X-Forwarded-For": "10.0.0.5"}
+    assert "X-Profile-Id" not in client.get(url, headers=sem_token).headers
+    assert client.get("/admin/perfis").status_code == 403
+    assert client.get("/admin/perfis", headers={"X-Admin-Token": "errado"}).status_code == 403
+
+    resp = client.get(url, headers=headers)
+    assert resp.status_code == 200
+    profile_id = int(resp.headers["X-Profile-Id"])
+
+    listados = client.get("/admin/perfis", headers=admin).json()
+    assert listados[0]["id"] == profile_id
+    assert listados[0]["caminho"] == "/relatorios/geral"
+
+    assert client.get(f"/admin/perfis/{profile_id}", headers=admin).status_code == 200
+    speedscope = client.get(f"/admin/perfis/{profile_id}?formato=speedscope", headers=admin).json()
+    assert speedscope["profiles"][0]["type"] == "sampled"
+
+def test_profiling_amostra_so_a_thread_do_handler():
+    """o handler registra sua thread no perfil só enquanto executa"""
+    import threading
+    from app import profiler
+
+    vistas = []
+    handler = profiler._track_thread(lambda: vistas.append(set(profiler._profiled_threads.get() or ())))
+    handler()   # sem perfil ativo: nada a registrar
+    assert vistas == [set()]
+
+    threads = set()
+    token = profiler._profiled_threads.set(threads)
+    try:
+        handler()
+    finally:
+        profiler._profiled_threads.reset(token)
+    assert vistas[-1] == {threading.get_ident()}
+    assert threads == set()
+
+def test_modelo_de_leitura_sincronizado():
+    """commits ORM atualizam o modelo colunar sem recarga"""
+    db = TestingSessionLocal()
+    try:
+        store = read_store.get(db)
+        room = client.post("/quartos/", json={
+            "number": 903, "type": "SIMPLES", "capacity": 1, "basic_fare": 70.0
+        }).json()
+        c_in = date.today() + timedelta(days=60)
+        r = client.post("/reservas/", json={
+            "guest_id": 1, "room_id": room["id"], "check_in": str(c_in),
+            "check_out": str(c_in + timedelta(days=2)), "n_guests": 1
+        })
+        res_id = r.json()["id"]
+
+        # quarto novo forca recarga; depois disso o mesmo store segue os commits
+        store = read_store.get(db)
+        assert store.has_overlap(room["id"], c_in, c_in + timedelta(days=1))
+        client.post(f"/reservas/{res_id}/cancel")
+        assert read_store.get(db) is store
+        assert not store.has_overlap(room["id"], c_in, c_in + timedelta(days=1))
+        assert store.fare[store.position[res_id]] == 70.0
+    finally:
+        db.close()
+
+def test_disponibilidade_consulta_a_tabela():
+    """reserva gravada fora do ORM (sem passar pelo modelo de leitura) bloqueia o quarto"""
+    room = client.post("/quartos/", json={
+        "number": 908, "type": "SIMPLES", "capacity": 1, "basic_fare": 70.0
+    }).json()
+    c_in = date.today() + timedelta(days=70)
+    db = TestingSessionLocal()
+    try:
+        store = read_store.get(db)
+        db.execute(models.Reservation.__table__.insert().values(
+            guest_id=1, room_id=room["id"], check_in=c_in, check_out=c_in + timedelta(days=2),
+            n_guests=1, status=models.StatusReservation.CONFIRMED
+        ))
+        db.commit()
+        assert not store.has_overlap(room["id"], c_in, c_in + timedelta(days=1))
+    finally:
+        db.close()
+
+    r = client.post("/reservas/", json={
+        "guest_id": 1, "room_id": room["id"], "check_in": str(c_in),
+        "check_out": str(c_in + timedelta(days=1)), "n_guests": 1
+    })
+    assert r.status_code == 400
+
+def test_carga_recepcao_resumo(monkeypatch):
+    """o cenário de recepção roda pela ASGITransport e resume cada operação"""
+    import asyncio
+    import httpx
+    from benchmarks import bench_recepcao
+
+    monkeypatch.setitem(SETTINGS, "RATE_LIMIT_ENABLED", False)
+    mix = bench_recepcao.parse_mix("relatorio=5")
+
+    async def rodar():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://recepcao") as carga:
+            return await bench_recepcao.executar(carga, mix, usuarios=4, requisicoes=120, quartos=10, chegadas=8)
+
+    resultado = asyncio.run(rodar())
+    assert resultado["total"]["requisicoes"] == 120
+    assert {"disponibilidade", "reserva", "checkin"} <= set(resultado["operacoes"])
+    assert not any(codigo.startswith("5") for codigo in resultado["total"]["status"])
+    # saldo calculado com a mesma tarifa do checkout: nenhum checkout recusado
+    assert set(resultado["operacoes"].get("checkout", {}).get("status", {})) <= {"200"}
+    total = resultado["total"]
+    assert total["p50_ms"] <= total["p95_ms"] <= total["p99_ms"]
+
+def test_relatorio_usa_diarias_lancadas():
+    """noites auditadas entram pelo valor lançado; só as restantes são calculadas"""
+    room = client.post("/quartos/", json={
+        "number": 905, "type": "SIMPLES", "capacity": 1, "basic_fare": 100.0
+    }).json()
+    c_in = date.today() + timedelta(days=500)
+    c_out = c_in + timedelta(days=3)
+    db = TestingSessionLocal()
+    try:
+        res = models.Reservation(guest_id=1, room_id=room["id"], check_in=c_in, check_out=c_out,
+                                 n_guests=1, status=models.StatusReservation.CHECKIN)
+        db.add(res)
+        db.flush()
+        db.add(models.RoomCharge(reservation_id=res.id, room_id=room["id"], date=c_in, value=123.0))
+        db.commit()
+    finally:
+        db.close()
+
+    headers = {"X-Forwarded-For": "10.0.0.6"}
+    esperado = 123.0 + utils.calculate_total_price(100.0, c_in + timedelta(days=1), c_out)
+    data = client.get(f"/relatorios/geral?start_date={c_in}&end_date={c_out}", headers=headers).json()
+    assert data["metricas"]["receita_diarias_lancadas"] == 123.0
+    assert data["metricas"]["receita_total_hospedagem"] == pytest.approx(esperado, abs=0.01)
+    assert data["metricas"]["room_nights_vendidas"] == 3
+
+    por_dia = client.get(f"/relatorios/geral?start_date={c_in}&end_date={c_out}&group_by=day", headers=headers).json()
+    assert por_dia["segmentos"]["receita"][0] == 123.0
+    assert sum(por_dia["segmentos"]["receita"]) == pytest.approx(esperado, abs=0.01)
+    por_quarto = client.get(f"/relatorios/geral?start_date={c_in}&end_date={c_out}&group_by=room", headers=headers).json()
+    assert sum(por_quarto["segmentos"]["receita"]) == pytest.approx(esperado, abs=0.01)
+
+def test_migracao_adiciona_colunas_novas(tmp_path):
+    """bancos antigos recebem reservas.created_at e AUTOINCREMENT no init"""
+    from sqlalchemy import inspect
+    from app.database import upgrade_schema
+    antigo = create_engine(f"sqlite:///{tmp_path / 'antigo.db'}")
+    with antigo.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE reservas (id INTEGER PRIMARY KEY, check_in DATE, check_out DATE, "
+            "n_guests INTEGER, status VARCHAR, guest_id INTEGER, room_id INTEGER)"
+        )
+        conn.exec_driver_sql("INSERT INTO reservas (id, n_guests) VALUES (3, 1)")
+        conn.exec_driver_sql("CREATE TABLE reservas_arquivo_2023 (id INTEGER PRIMARY KEY)")
+        conn.exec_driver_sql("INSERT INTO reservas_arquivo_2023 (id) VALUES (5)")
+    upgrade_schema(antigo)
+    upgrade_schema(antigo)  # idempotente
+    assert "created_at" in {c["name"] for c in inspect(antigo).get_columns("reservas")}
+
+    # tabela recriada com AUTOINCREMENT, sem reutilizar ids quentes nem arquivados
+    with antigo.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM reservas WHERE id = 3")
+        novo = conn.exec_driver_sql("INSERT INTO reservas (n_guests) VALUES (1) RETURNING id").scalar()
+    assert novo == 6
+    antigo.dispose()
+
+def test_feed_de_eventos_fora_das_vagas_globais(monkeypatch):
+    """o long-poll não disputa as vagas globais com o resto do tráfego"""
+    monkeypatch.setitem(SETTINGS, "MAX_CONCURRENT_REQUESTS", SETTINGS["PRIORITY_RESERVED_SLOTS"])
+    assert client.get("/quartos/").status_code == 503
+    feed = client.get("/reservas/eventos?since=0&limit=1", headers={"X-Forwarded-For": "10.0.0.7"})
+    assert feed.status_code == 200
+    assert limiter.total_in_flight == 0
+
+def test_modelo_de_leitura_alcanca_commits_de_outro_worker():
+    """commit de outro processo é aplicado pelos eventos, sem recarregar o store"""
+    from sqlalchemy import insert
+    from app.coordination import versions
+    from app.database import database_key
+
+    room = client.post("/quartos/", json={
+        "number": 907, "type": "SIMPLES", "capacity": 1, "basic_fare": 90.0
+    }).json()
+    c_in = date.today() + timedelta(days=700)
+    db = TestingSessionLocal()
+    try:
+        store = read_store.get(db)
+        key = database_key(db)
+
+        # outro worker grava a reserva e o evento e sobe a versão compartilhada
+        res_id = db.execute(insert(models.Reservation).values(
+            guest_id=1, room_id=room["id"], check_in=c_in, check_out=c_in + timedelta(days=2),
+            n_guests=1, status=models.StatusReservation.CONFIRMED
+        )).inserted_primary_key[0]
+        db.execute(insert(models.ReservationEvent).values(
+            reservation_id=res_id, status=models.StatusReservation.CONFIRMED
+        ))
+        db.commit()
+        versions.bump(read_store._version_name(key))
+
+        assert read_store.get(db) is store
+        assert store.has_overlap(room["id"], c_in, c_in + timedelta(days=1))
+        assert store.fare[store.position[res_id]] == 90.0
+    finally:
+        db.close()
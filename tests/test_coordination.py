@@ -0,0 +1,24 @@
+from app.coordination import VersionCounter
+from app.settings import SETTINGS
+
+def test_versoes_locais_sem_arquivo(monkeypatch):
+    """sem COORDINATION_DB o contador fica em memória"""
+    monkeypatch.setitem(SETTINGS, "COORDINATION_DB", None)
+    contador = VersionCounter()
+    assert contador.current("catalogo") == 0
+    assert contador.bump("catalogo") == 1
+    assert contador.current("catalogo") == 1
+    assert contador.current("reservas") == 0
+
+def test_versoes_compartilhadas_entre_processos(monkeypatch, tmp_path):
+    """dois contadores no mesmo arquivo enxergam os incrementos um do outro"""
+    monkeypatch.setitem(SETTINGS, "COORDINATION_DB", str(tmp_path / "coordenacao.db"))
+    worker_a, worker_b = VersionCounter(), VersionCounter()
+    try:
+        assert worker_a.bump("catalogo") == 1
+        assert worker_b.current("catalogo") == 1
+        assert worker_b.bump("catalogo") == 2
+        assert worker_a.current("catalogo") == 2
+    finally:
+        worker_a.close()
+        worker_b.close()